@@ -0,0 +1,207 @@
+"""
+准入控制与过载保护 - 按接口限并发 + 有界等待队列 + 优先级 + 请求时限
+所有接口共享总槽位，空出的槽位优先分给 /rag/base；队列满立即 429，排队超时 503，均带 Retry-After
+请求时限通过 contextvar 传递到 LLM / Embedding / Qdrant 调用（asyncio.to_thread 会复制上下文）
+"""
+import asyncio
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from agentic_rag_test.agentic_rag.config import ADMISSION_POLICIES, ADMISSION_TOTAL_SLOTS
+from agentic_rag_test.agentic_rag.metrics import ADMISSION_REJECTED, QUEUE_DEPTH
+
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """请求时限已到"""
+
+
+class Overloaded(Exception):
+    """拒绝准入：status_code 为 429（队列满）或 503（排队超时）"""
+
+    def __init__(self, status_code: int, retry_after: int, reason: str):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+def set_deadline(seconds: Optional[float]):
+    """设置当前请求的时限，返回 token 供 reset"""
+    return _deadline.set(time.monotonic() + seconds if seconds else None)
+
+
+def remaining() -> Optional[float]:
+    """当前请求剩余秒数；无时限返回 None，已超时抛 DeadlineExceeded"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    left = deadline - time.monotonic()
+    if left <= 0:
+        raise DeadlineExceeded("请求已超过时限")
+    return left
+
+
+def expired() -> bool:
+    """当前请求是否已超过时限"""
+    deadline = _deadline.get()
+    return deadline is not None and time.monotonic() >= deadline
+
+
+def deadline_kwargs() -> dict:
+    """
+    OpenAI 兼容客户端 with_options 参数：timeout 为剩余时间且不重试
+    （客户端默认重试 2 次、每次都用完整 timeout，总耗时会超出时限约 3 倍）；无时限时为空，保持客户端默认值
+    """
+    left = remaining()
+    return {"timeout": left, "max_retries": 0} if left is not None else {}
+
+
+def qdrant_timeout() -> Optional[int]:
+    """Qdrant 请求 timeout（整数秒，向上取整）"""
+    left = remaining()
+    return max(math.ceil(left), 1) if left is not None else None
+
+
+@dataclass
+class EndpointPolicy:
+    limit: int  # 本接口最大并发
+    queue: int  # 最大排队数，超出立即 429
+    max_wait: float  # 最长排队秒数，超出 503
+    priority: int  # 越小越优先获得空出的槽位
+    deadline: Optional[float]  # 请求总时限（秒），None 表示不限
+
+
+@dataclass
+class _Waiter:
+    priority: int
+    seq: int
+    name: str
+    future: asyncio.Future
+
+
+class AdmissionController:
+    """单进程准入控制器：每个接口独立并发上限，所有接口共享 total_slots"""
+
+    def __init__(self, total_slots: int, policies: Dict[str, EndpointPolicy]):
+        self.total_slots = total_slots
+        self.policies = policies
+        self.active = {name: 0 for name in policies}
+        self.waiters: List[_Waiter] = []
+        self.service_time = {name: 1.0 for name in policies}  # 平均服务时间（EWMA），用于估算 Retry-After
+        self._seq = itertools.count()
+
+    def _can_run(self, name: str) -> bool:
+        return (
+            self.active[name] < self.policies[name].limit
+            and sum(self.active.values()) < self.total_slots
+        )
+
+    def _queued(self, name: str) -> int:
+        return sum(1 for w in self.waiters if w.name == name)
+
+    def _retry_after(self, name: str) -> int:
+        policy = self.policies[name]
+        backlog = self._queued(name) + 1
+        return max(math.ceil(self.service_time[name] * backlog / policy.limit), 1)
+
+    def _report(self, name: str) -> None:
+        QUEUE_DEPTH.labels(f"admission_{name}").set(self._queued(name))
+
+    def _grant(self, waiter: _Waiter) -> None:
+        self.waiters.remove(waiter)
+        self.active[waiter.name] += 1
+        waiter.future.set_result(True)
+        self._report(waiter.name)
+
+    def _wake(self) -> None:
+        """按 (优先级, 到达顺序) 把空出的槽位分给可运行的等待者"""
+        for waiter in sorted(self.waiters, key=lambda w: (w.priority, w.seq)):
+            if waiter.future.done():
+                continue
+            if sum(self.active.values()) >= self.total_slots:
+                break
+            if self._can_run(waiter.name):
+                self._grant(waiter)
+
+    def reject(self, name: str, status_code: int, reason: str) -> Overloaded:
+        """记录拒绝并构造带 Retry-After 估计的 Overloaded"""
+        ADMISSION_REJECTED.labels(name, str(status_code)).inc()
+        return Overloaded(status_code, self._retry_after(name), reason)
+
+    async def acquire(self, name: str) -> None:
+        policy = self.policies[name]
+        # 同级或更高优先级且可运行的等待者先行，避免新请求插队
+        ahead = any(w.priority <= policy.priority and self._can_run(w.name) for w in self.waiters)
+        if not ahead and self._can_run(name):
+            self.active[name] += 1
+            return
+        if self._queued(name) >= policy.queue:
+            raise self.reject(name, 429, f"{name} 排队已满")
+
+        waiter = _Waiter(policy.priority, next(self._seq), name, asyncio.get_running_loop().create_future())
+        self.waiters.append(waiter)
+        self._report(name)
+        timeout = policy.max_wait
+        left = remaining()
+        if left is not None:
+            timeout = min(timeout, left)
+        try:
+            await asyncio.wait_for(waiter.future, timeout=timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # 超时与分配槽位同时发生：槽位已到手，照常放行
+                if isinstance(e, asyncio.CancelledError):
+                    self.release(name, 0.0)
+                    raise
+                return
+            if waiter in self.waiters:
+                self.waiters.remove(waiter)
+            self._report(name)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise self.reject(name, 503, f"{name} 排队超时") from None
+
+    def release(self, name: str, elapsed: float) -> None:
+        self.active[name] -= 1
+        if elapsed:
+            self.service_time[name] = 0.8 * self.service_time[name] + 0.2 * elapsed
+        self._wake()
+
+    @asynccontextmanager
+    async def admit(self, name: str):
+        """占用 name 接口的一个槽位，并在请求期间设置时限"""
+        token = set_deadline(self.policies[name].deadline)
+        try:
+            await self.acquire(name)
+            start = time.monotonic()
+            try:
+                yield
+            finally:
+                self.release(name, time.monotonic() - start)
+        finally:
+            _deadline.reset(token)
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        return {name: {"active": self.active[name], "queued": self._queued(name)} for name in self.policies}
+
+
+# 接口路径 → 准入类别
+ENDPOINT_CLASSES = {
+    "/rag/base": "base",
+    "/rag/auto": "auto",
+    "/rag/agentic": "agentic",
+    "/upload/zip": "upload",
+    "/upload/zip/queue": "upload",
+}
+
+ADMISSION = AdmissionController(
+    ADMISSION_TOTAL_SLOTS,
+    {name: EndpointPolicy(**policy) for name, policy in ADMISSION_POLICIES.items()},
+)
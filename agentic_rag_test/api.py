@@ -3,37 +3,62 @@ Agentic RAG - FastAPI 入口
 """
 import os
 import io
+import asyncio
+import hmac
+import time
 import zipfile
-from fastapi import FastAPI, File, UploadFile, HTTPException, Request
-from agentic_rag_test.agentic_rag.file_processor import FileProcessor  # 文档处理类
+from fastapi import Depends, FastAPI, File, Header, UploadFile, HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from starlette.routing import Match
+from agentic_rag_test.agentic_rag.file_processor import FileProcessor, DOC_EXTS, IMG_EXTS  # 文档处理类
 from deepagents import create_deep_agent
 from langchain.agents import create_agent
 from dotenv import load_dotenv
 from langchain_deepseek import ChatDeepSeek
 from agentic_rag_test.agentic_rag.prompt.agentic_report_prompt import SYSTEM_PROMPT
-from agentic_rag_test.agentic_rag.tools.base_rag import ask_base_rag,search_base_rag
+from agentic_rag_test.agentic_rag.tools.base_rag import ask_base_rag, retrieve
+from agentic_rag_test.agentic_rag.tools.retrieval_memo import RetrievalMemo, make_agent_tools
+from agentic_rag_test.agentic_rag.tools.router import route_query
 from agentic_rag_test.agentic_rag.database.history_repository import log_history, get_history
 from agentic_rag_test.agentic_rag.database.history_tables import ensure_history_table
+from agentic_rag_test.agentic_rag.database.ingest_repository import create_job, get_job
+from agentic_rag_test.agentic_rag.database.ingest_tables import ensure_ingest_tables
 from agentic_rag_test.agentic_rag.database.db import engine, Base
 from agentic_rag_test.agentic_rag.database import models # noqa: F401  # 注册 ORM 模型，便于 create_all
 from typing import Optional
 from agentic_rag_test.agentic_rag.qdrant_manager import QDRANT_MANAGER
+from agentic_rag_test.agentic_rag.llm_factory import DeadlineCallback, UsageCallback
+from agentic_rag_test.agentic_rag.admission import ADMISSION, ENDPOINT_CLASSES, Overloaded, deadline_kwargs, expired
+from agentic_rag_test.agentic_rag.config import ADMIN_TOKEN
+from agentic_rag_test.agentic_rag.reindex import ReindexJob, ReindexLock
+from agentic_rag_test.agentic_rag.metrics import HTTP_IN_FLIGHT, HTTP_LATENCY, render_latest, span
 from deepagents.backends import FilesystemBackend
 
 load_dotenv()
 
-# DeepSeek 模型（Agent 推理）
-deepseek_model = ChatDeepSeek(
-    model="deepseek-chat",
-    temperature=0,
-    max_tokens=None,
-    timeout=None,
-    max_retries=2,
-)
+AGENT_MODEL = "deepseek-chat"
+
+
+def agent_model() -> ChatDeepSeek:
+    """
+    DeepSeek 模型（Agent 推理），每次运行新建：有请求时限时单次调用 timeout 为剩余时间且不重试，
+    配合 DeadlineCallback 在时限到后不再发起新调用
+    """
+    return ChatDeepSeek(
+        model=AGENT_MODEL,
+        temperature=0,
+        max_tokens=None,
+        **{"timeout": None, "max_retries": 2, **deadline_kwargs()},
+    )
+
 
 # Qdrant 管理实例（共享给 FileProcessor 和 base_rag）
 qdrant_manager = QDRANT_MANAGER()
 
+# 本进程当前/最近一次重建任务；跨进程互斥由 Postgres advisory lock 保证
+reindex_job: Optional[ReindexJob] = None
+reindex_lock = ReindexLock()
+
 app = FastAPI(
     title="Agentic RAG",
     description="基于商业研究报告的智能问答与报告生成系统",
@@ -41,11 +66,62 @@ app = FastAPI(
 )
 
 
+@app.middleware("http")
+async def admission_control(request: Request, call_next):
+    """准入控制：按接口限并发与排队，队列满 429、排队或请求超时 503，均带 Retry-After"""
+    name = ENDPOINT_CLASSES.get(request.url.path)
+    if name is None or request.method != "POST":
+        return await call_next(request)
+    try:
+        async with ADMISSION.admit(name):
+            try:
+                return await call_next(request)
+            except Exception:
+                if expired():
+                    raise ADMISSION.reject(name, 503, f"{name} 请求超过时限") from None
+                raise
+    except Overloaded as e:
+        return JSONResponse(
+            {"detail": e.reason},
+            status_code=e.status_code,
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+
+def route_template(request: Request) -> str:
+    """请求匹配的路由模板（如 /ingest/jobs/{job_id}），未匹配为 unmatched，避免指标标签随路径参数无限增长"""
+    for route in app.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return route.path
+    return "unmatched"
+
+
+@app.middleware("http")
+async def observe_requests(request: Request, call_next):
+    """记录每个接口的耗时、并发数，并为每个请求开启 trace span"""
+    if request.url.path == "/metrics":
+        return await call_next(request)
+    path = route_template(request)
+    start = time.perf_counter()
+    status = 500
+    HTTP_IN_FLIGHT.labels(path).inc()
+    try:
+        with span("http_request", path=path, method=request.method):
+            response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        HTTP_IN_FLIGHT.labels(path).dec()
+        HTTP_LATENCY.labels(path, str(status)).observe(time.perf_counter() - start)
+
+
 @app.on_event("startup")
 async def on_startup() -> None:
-    """启动时创建历史表"""
-    for iface in ("rag_base", "rag_agentic"):
+    """启动时创建历史表与入库队列表"""
+    for iface in ("rag_base", "rag_agentic", "rag_auto"):
         await ensure_history_table(iface)
+    await ensure_ingest_tables()
 
 
 @app.get("/")
@@ -54,6 +130,36 @@ def root():
     return {"message": "Agentic RAG is running", "docs": "/docs"}
 
 
+@app.get("/metrics")
+def metrics():
+    """Prometheus 指标"""
+    body, content_type = render_latest()
+    return Response(content=body, media_type=content_type)
+
+
+@app.get("/admission")
+def admission_status():
+    """各接口当前并发与排队数"""
+    return {"total_slots": ADMISSION.total_slots, "endpoints": ADMISSION.snapshot()}
+
+
+def decode_zip_names(zf: zipfile.ZipFile) -> dict:
+    """ZIP 内中文文件名解码，返回 {解码名: 原始名}，仅保留可处理的文档/图片"""
+    decode_map = {}
+    for raw_name in zf.namelist():
+        decoded_name = raw_name
+        try:
+            decoded_name = raw_name.encode("cp437").decode("gbk")
+        except Exception:
+            try:
+                decoded_name = raw_name.encode("cp437").decode("gb2312")
+            except Exception:
+                pass
+        if decoded_name.lower().endswith(DOC_EXTS + IMG_EXTS):
+            decode_map[decoded_name] = raw_name
+    return decode_map
+
+
 @app.post("/upload/zip")
 async def upload_zip(file: UploadFile = File(...)):
     """上传 ZIP，解压并处理文档/图片，向量化后存入 Qdrant"""
@@ -61,26 +167,8 @@ async def upload_zip(file: UploadFile = File(...)):
         processor = FileProcessor(qdrant_manager=qdrant_manager)
         zip_content = await file.read()
         with zipfile.ZipFile(io.BytesIO(zip_content)) as zf:
-            decoded_files = []
-            decode_map = {}
-            for raw_name in zf.namelist():
-                decoded_name = raw_name
-                try:
-                    decoded_name = raw_name.encode("cp437").decode("gbk")
-                except Exception:
-                    try:
-                        decoded_name = raw_name.encode("cp437").decode("gb2312")
-                    except Exception:
-                        pass
-                decoded_files.append(decoded_name)
-                decode_map[decoded_name] = raw_name
-
-            doc_exts = (".pdf", ".docx", ".pptx", ".doc")
-            img_exts = (".png", ".jpg", ".jpeg", ".bmp", ".gif", ".webp", ".tiff", ".tif")
-            target_files = [
-                f for f in decoded_files
-                if f.lower().endswith(doc_exts + img_exts)
-            ]
+            decode_map = decode_zip_names(zf)
+            target_files = list(decode_map)
             if not target_files:
                 raise HTTPException(
                     status_code=400,
@@ -93,10 +181,9 @@ async def upload_zip(file: UploadFile = File(...)):
                     raw_name = decode_map[decoded_name]
                     file_bytes = zf.read(raw_name)
                     ext = os.path.splitext(decoded_name)[1].lower()
-                    if ext in img_exts:
-                        processor.process_image_file(file_bytes, decoded_name)
-                    else:
-                        processor.process_file_content(file_bytes, decoded_name)
+                    process = processor.process_image_file if ext in IMG_EXTS else processor.process_file_content
+                    with span("ingest_file", filename=decoded_name, bytes=len(file_bytes)):
+                        await asyncio.to_thread(process, file_bytes, decoded_name)
                     results.append({"filename": decoded_name, "status": "success"})
                 except Exception as e:
                     results.append({
@@ -110,10 +197,85 @@ async def upload_zip(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=str(e)) from e
 
 
+@app.post("/upload/zip/queue")
+async def upload_zip_queue(file: UploadFile = File(...)):
+    """上传 ZIP 并写入分布式入库队列，由 ingest_worker 进程处理，立即返回 job_id"""
+    zip_content = await file.read()
+    with zipfile.ZipFile(io.BytesIO(zip_content)) as zf:
+        decode_map = decode_zip_names(zf)
+        if not decode_map:
+            raise HTTPException(status_code=400, detail="未找到可处理的文档或图片文件")
+        # 图片直接作为页面任务，文档先作为文件任务再由 worker 拆页
+        files = [
+            (
+                decoded_name,
+                "page" if decoded_name.lower().endswith(IMG_EXTS) else "file",
+                zf.read(raw_name),
+            )
+            for decoded_name, raw_name in decode_map.items()
+        ]
+    job_id = await create_job(source=file.filename, files=files)
+    return {"job_id": job_id, "files": len(files), "status_url": f"/ingest/jobs/{job_id}"}
+
+
+@app.get("/ingest/jobs/{job_id}")
+async def ingest_job_status(job_id: int):
+    """入库批次进度"""
+    job = await get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return job
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    """管理接口鉴权：请求头 X-Admin-Token 须与 ADMIN_TOKEN 一致，未配置 ADMIN_TOKEN 时一律拒绝"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="未配置 ADMIN_TOKEN，管理接口已禁用")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="管理凭证无效")
+
+
+@app.post("/admin/reindex", dependencies=[Depends(require_admin)])
+async def start_reindex(
+    embedding_model: Optional[str] = None,
+    dim: Optional[int] = None,
+    hnsw_m: Optional[int] = None,
+    ef_construct: Optional[int] = None,
+    drop_old: bool = False,
+):
+    """后台重建索引：用已存摘要重新向量化到新集合，完成后原子切换别名，期间检索不受影响"""
+    global reindex_job
+    params = {
+        "embedding_model": embedding_model,
+        "dim": dim,
+        "hnsw_m": hnsw_m,
+        "ef_construct": ef_construct,
+    }
+    job = ReindexJob(drop_old=drop_old, **{k: v for k, v in params.items() if v is not None})
+    if not await asyncio.to_thread(job.lock.acquire):
+        raise HTTPException(status_code=409, detail="已有重建索引或批量导入任务在运行")
+    reindex_job = job
+    reindex_job.start()
+    return {"message": "重建任务已启动", "status_url": "/admin/reindex"}
+
+
+@app.get("/admin/reindex", dependencies=[Depends(require_admin)])
+async def reindex_status():
+    """重建进度：阶段、已复制点数、速率与预计剩余时间（任务在其他 worker 上运行时只报告 running_elsewhere）"""
+    active = qdrant_manager.resolve_collection()
+    if reindex_job is not None and reindex_job.running:
+        return {**reindex_job.state, "active": active}
+    if await asyncio.to_thread(reindex_lock.held):
+        return {"status": "running_elsewhere", "active": active}
+    if reindex_job is None:
+        return {"status": "idle", "active": active}
+    return {**reindex_job.state, "active": active}
+
+
 @app.post("/rag/base")
 async def base_rag(message: str, request: Request):
     """Base RAG：单次检索 + 生成回答"""
-    ai_response = ask_base_rag(message)
+    ai_response = await asyncio.to_thread(ask_base_rag, message)
     await log_history(
         "rag_base",
         request_text=message,
@@ -134,24 +296,47 @@ async def base_rag_history(
     return await get_history("rag_base", limit=limit, offset=offset, user_id=user_id)
 
 
-@app.post("/rag/agentic")
-async def agentic_rag(message: str, request: Request):
-    """Agentic RAG：Agent 多轮检索、综合信息、生成报告"""
+def run_agent(message: str, seed_hits: list = None) -> tuple:
+    """
+    运行 Deep Agent；seed_hits 为已完成的首轮检索结果，作为初始资料交给 Agent 避免重复检索
+    本次运行的检索共用一个 RetrievalMemo，返回 (报告内容, {"retrieval_memo", "llm_usage"})
+    系统提示、工具定义每轮不变，初始资料放在问题之前，使各轮及不同请求之间尽量共享前缀缓存
+    """
+    memo = RetrievalMemo()
+    usage = UsageCallback("deepseek", AGENT_MODEL)
     agent = create_deep_agent(
-        model=deepseek_model,
-        tools=[search_base_rag],
+        model=agent_model(),
+        tools=make_agent_tools(memo),
         system_prompt=SYSTEM_PROMPT,
         backend=FilesystemBackend(root_dir="./report_output", virtual_mode=True),
         debug=True,
     )
-    result = agent.invoke({"messages": [{"role": "user", "content": message}]})
-    content = result["messages"][-1].content
+    content = message
+    if seed_hits:
+        content = (
+            f"【已用下方用户问题完成一次 search_base_rag 检索，结果如下，无需再用原问题检索，"
+            f"如需补充请换角度拆解子问题】\n{memo.format_hits(seed_hits)}\n"
+            f"用户问题：{message}"
+        )
+    result = agent.invoke(
+        {"messages": [{"role": "user", "content": content}]},
+        config={"callbacks": [usage, DeadlineCallback()]},
+    )
+    report = {"retrieval_memo": memo.report(), "llm_usage": usage.report()}
+    print(f"[INFO] Agent 运行统计：{report}")
+    return result["messages"][-1].content, report
+
+
+@app.post("/rag/agentic")
+async def agentic_rag(message: str, request: Request):
+    """Agentic RAG：Agent 多轮检索、综合信息、生成报告"""
+    content, agent_report = await asyncio.to_thread(run_agent, message)
     await log_history(
         "rag_agentic",
         request_text=message,
         response_text=content,
         user_id=None,
-        meta={"endpoint": "/rag/agentic"},
+        meta={"endpoint": "/rag/agentic", **agent_report},
     )
     return content
 
@@ -166,3 +351,34 @@ async def agentic_rag_history(
     return await get_history(
         "rag_agentic", limit=limit, offset=offset, user_id=user_id
     )
+
+
+@app.post("/rag/auto")
+async def auto_rag(message: str, request: Request):
+    """自动路由：先检索一次，按分数分布、命中文档数与问题复杂度选择 Base 或 Agentic"""
+    hits = await asyncio.to_thread(retrieve, message)
+    decision = route_query(message, hits)
+    meta = {"endpoint": "/rag/auto", "routing": decision}
+    if decision["route"] == "agentic":
+        content, agent_report = await asyncio.to_thread(run_agent, message, hits)
+        meta.update(agent_report)
+    else:
+        content = await asyncio.to_thread(ask_base_rag, message, hits)
+    await log_history(
+        "rag_auto",
+        request_text=message,
+        response_text=content,
+        user_id=None,
+        meta=meta,
+    )
+    return content
+
+
+@app.get("/rag/auto/history")
+async def auto_rag_history(
+    limit: int = 20,
+    offset: int = 0,
+    user_id: Optional[str] = None,
+):
+    """自动路由历史记录（meta.routing 含路由决策与信号）"""
+    return await get_history("rag_auto", limit=limit, offset=offset, user_id=user_id)
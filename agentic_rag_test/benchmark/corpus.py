@@ -0,0 +1,96 @@
+"""
+合成语料生成 - 生成带文本层页、纯图片页、空白页的 PDF 以及 PPTX，用于离线压测
+"""
+import io
+import random
+from pathlib import Path
+from typing import List
+
+import fitz
+from PIL import Image, ImageDraw
+
+SENTENCES = [
+    "公司2024年实现营业收入同比增长23.5%，主要受益于核心产品放量。",
+    "行业集中度持续提升，头部企业市场份额超过40%。",
+    "研发投入占营收比例达到18%，在研管线进入临床三期。",
+    "毛利率受原材料价格波动影响，同比下降1.2个百分点。",
+    "海外业务拓展顺利，东南亚市场收入翻倍。",
+    "维持买入评级，目标价对应2025年25倍市盈率。",
+]
+
+
+def _page_text(rnd: random.Random, n: int) -> str:
+    return "\n".join(rnd.choice(SENTENCES) for _ in range(n))
+
+
+def _noise_image(rnd: random.Random, width: int = 800, height: int = 1000) -> bytes:
+    """模拟扫描页：随机线条与色块，无文本层"""
+    img = Image.new("RGB", (width, height), (255, 255, 255))
+    draw = ImageDraw.Draw(img)
+    for _ in range(60):
+        x0, y0 = rnd.randrange(width), rnd.randrange(height)
+        draw.line((x0, y0, x0 + rnd.randrange(200), y0), fill=(30, 30, 30), width=3)
+    for _ in range(5):
+        x0, y0 = rnd.randrange(width - 200), rnd.randrange(height - 200)
+        draw.rectangle((x0, y0, x0 + 150, y0 + 100), fill=(rnd.randrange(255), 120, 180))
+    buf = io.BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def make_pdf(path: Path, pages: int, seed: int, scanned_ratio: float = 0.3, blank_ratio: float = 0.05) -> None:
+    rnd = random.Random(seed)
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page(width=595, height=842)  # A4
+        roll = rnd.random()
+        if roll < blank_ratio:
+            continue
+        if roll < blank_ratio + scanned_ratio:
+            page.insert_image(page.rect, stream=_noise_image(rnd))
+        else:
+            page.insert_textbox(
+                fitz.Rect(50, 50, 545, 792),
+                _page_text(rnd, rnd.randint(10, 40)),
+                fontname="china-s",
+                fontsize=11,
+            )
+    doc.save(str(path))
+    doc.close()
+
+
+def make_pptx(path: Path, slides: int, seed: int) -> None:
+    from pptx import Presentation
+    from pptx.util import Inches, Pt
+
+    rnd = random.Random(seed)
+    prs = Presentation()
+    for i in range(slides):
+        slide = prs.slides.add_slide(prs.slide_layouts[5])
+        slide.shapes.title.text = f"第{i + 1}页 业绩回顾"
+        box = slide.shapes.add_textbox(Inches(0.5), Inches(1.5), Inches(9), Inches(5))
+        box.text_frame.text = _page_text(rnd, 6)
+        for p in box.text_frame.paragraphs:
+            for run in p.runs:
+                run.font.size = Pt(16)
+    prs.save(str(path))
+
+
+def generate_corpus(out_dir: Path, pdfs: int = 5, pages_per_pdf: int = 10, pptx: int = 0, seed: int = 42) -> List[Path]:
+    """
+    生成合成语料
+
+    Returns:
+        List[Path]: 生成的文件路径
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i in range(pdfs):
+        path = out_dir / f"report_{i:03d}.pdf"
+        make_pdf(path, pages_per_pdf, seed + i)
+        paths.append(path)
+    for i in range(pptx):
+        path = out_dir / f"slides_{i:03d}.pptx"
+        make_pptx(path, pages_per_pdf, seed + 1000 + i)
+        paths.append(path)
+    return paths
@@ -0,0 +1,359 @@
+"""
+离线压测入口 - 本地 stub 替代 LLM/OCR、内存模式 Qdrant、合成语料
+输出入库吞吐、分阶段延迟、峰值内存、/rag/base 并发 p50/p99，结果保存为 JSON 便于跨提交对比
+stub 运行在独立子进程；指定 --api-url 时语料经 /upload/zip 入库、查询压测该服务，token 与页数取自其 /metrics
+
+用法：
+    python -m agentic_rag_test.agentic_rag.benchmark.run_benchmark --pdfs 5 --pages 10 --concurrency 8
+    python -m agentic_rag_test.agentic_rag.benchmark.run_benchmark --api-url http://localhost:8000
+    python -m agentic_rag_test.agentic_rag.benchmark.run_benchmark --compare benchmark_results/上次结果.json
+"""
+import argparse
+import functools
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zipfile
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List
+
+from agentic_rag_test.agentic_rag.benchmark.corpus import SENTENCES, generate_corpus
+from agentic_rag_test.agentic_rag.benchmark.stub_server import StubConfig, StubServer
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = min(int(round(pct / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[k]
+
+
+def latency_summary(values: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(values),
+        "mean_ms": round(sum(values) / len(values) * 1000, 2) if values else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+        "total_s": round(sum(values), 3),
+    }
+
+
+class StageTimer:
+    """包装函数并按阶段记录耗时"""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self.lock = threading.Lock()
+
+    def wrap(self, stage: str, fn):
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self.lock:
+                    self.samples[stage].append(time.perf_counter() - start)
+        return inner
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        return {stage: latency_summary(v) for stage, v in sorted(self.samples.items())}
+
+
+def peak_rss_mb() -> float:
+    """进程峰值常驻内存（Linux ru_maxrss 单位为 KB）"""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / 1024 if sys.platform != "darwin" else rss / 1024 / 1024, 1)
+
+
+def llm_token_totals() -> Dict[str, float]:
+    """按 kind 汇总本进程累计的 LLM token（prompt / completion / cached）"""
+    from agentic_rag_test.agentic_rag.metrics import LLM_TOKENS
+
+    totals = defaultdict(float)
+    for metric in LLM_TOKENS.collect():
+        for sample in metric.samples:
+            if sample.name.endswith("_total"):
+                totals[sample.labels["kind"]] += sample.value
+    totals = dict(totals)
+    if totals.get("prompt"):
+        totals["cache_hit_ratio"] = round(totals.get("cached", 0.0) / totals["prompt"], 4)
+    return totals
+
+
+def scrape_metrics(api_url: str) -> Dict[str, float]:
+    """读取服务 /metrics，按样本名与 kind/outcome 汇总计数器"""
+    import httpx
+    from prometheus_client.parser import text_string_to_metric_families
+
+    resp = httpx.get(f"{api_url.rstrip('/')}/metrics", timeout=30)
+    resp.raise_for_status()
+    totals = defaultdict(float)
+    for family in text_string_to_metric_families(resp.text):
+        for sample in family.samples:
+            if sample.name == "rag_llm_tokens_total":
+                totals[f"llm_tokens.{sample.labels['kind']}"] += sample.value
+            elif sample.name == "rag_ingested_pages_total":
+                totals["pages"] += sample.value
+            elif sample.name == "process_resident_memory_bytes":
+                totals["rss_bytes"] = sample.value
+    return dict(totals)
+
+
+def metrics_delta(before: Dict[str, float], after: Dict[str, float], prefix: str) -> Dict[str, float]:
+    return {
+        key[len(prefix):]: after[key] - before.get(key, 0.0)
+        for key in after if key.startswith(prefix)
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return "unknown"
+
+
+def configure_env(base_url: str) -> None:
+    """在导入项目模块前把所有外部依赖指向本地"""
+    for key in ("DASHSCOPE_API_KEY", "DEEPSEEK_API_KEY", "KIMI_API_KEY"):
+        os.environ[key] = "sk-stub"
+    for key in ("DASHSCOPE_BASE_URL", "DEEPSEEK_BASE_URL", "KIMI_BASE_URL"):
+        os.environ[key] = base_url
+    os.environ["QDRANT_PATH"] = ":memory:"
+
+
+def run_ingestion(files: List[Path], timer: StageTimer) -> Dict[str, Any]:
+    from agentic_rag_test.agentic_rag import file_processor
+    from agentic_rag_test.agentic_rag.file_processor import FileProcessor
+    from agentic_rag_test.agentic_rag.llm_factory import LLMClient
+    from agentic_rag_test.agentic_rag.tools import base_rag
+
+    processor = FileProcessor(qdrant_manager=base_rag.qdrant_manager)
+    processor.convert_to_pdf = timer.wrap("convert", processor.convert_to_pdf)
+    processor.extract_text_layers = timer.wrap("text_layer", processor.extract_text_layers)
+    processor.pdf_to_images = timer.wrap("render", processor.pdf_to_images)
+    processor.ai_models.qwen_vision = timer.wrap("summary", processor.ai_models.qwen_vision)
+    file_processor.kimi_file_upload = timer.wrap("ocr", file_processor.kimi_file_upload)
+    LLMClient.embedding = timer.wrap("embed", LLMClient.embedding)
+    LLMClient.embedding_batch = timer.wrap("embed", LLMClient.embedding_batch)
+    qdrant_manager = base_rag.qdrant_manager
+    qdrant_manager.store_vectors = timer.wrap("upsert", qdrant_manager.store_vectors)
+
+    pages = 0
+    failed = 0
+    start = time.perf_counter()
+    for path in files:
+        try:
+            result = processor.process_file_content(path.read_bytes(), path.name)
+            pages += len(result["image_paths"]) + len(result.get("skipped_pages", []))
+        except Exception as e:
+            failed += 1
+            print(f"[WARN] 入库失败 {path.name}: {e}")
+    elapsed = time.perf_counter() - start
+    processor.cleanup()
+    return {
+        "files": len(files),
+        "failed_files": failed,
+        "pages": pages,
+        "wall_s": round(elapsed, 3),
+        "pages_per_sec": round(pages / elapsed, 3) if elapsed else 0.0,
+    }
+
+
+def run_api_ingestion(files: List[Path], api_url: str) -> Dict[str, Any]:
+    """把语料打成 ZIP 经 /upload/zip 同步入库，页数取服务端 rag_ingested_pages_total 的增量"""
+    import httpx
+
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        for path in files:
+            zf.write(path, path.name)
+    before = scrape_metrics(api_url)
+    start = time.perf_counter()
+    resp = httpx.post(
+        f"{api_url.rstrip('/')}/upload/zip",
+        files={"file": ("bench_corpus.zip", buf.getvalue(), "application/zip")},
+        timeout=None,
+    )
+    resp.raise_for_status()
+    elapsed = time.perf_counter() - start
+    pages = scrape_metrics(api_url).get("pages", 0.0) - before.get("pages", 0.0)
+    failed = [r for r in resp.json()["results"] if r["status"] != "success"]
+    for r in failed:
+        print(f"[WARN] 入库失败 {r['filename']}: {r.get('error')}")
+    return {
+        "files": len(files),
+        "failed_files": len(failed),
+        "pages": int(pages),
+        "wall_s": round(elapsed, 3),
+        "pages_per_sec": round(pages / elapsed, 3) if elapsed else 0.0,
+    }
+
+
+def run_queries(queries: int, concurrency: int, timer: StageTimer, api_url: str = None) -> Dict[str, Any]:
+    """并发压测 /rag/base：默认进程内调用 ask_base_rag，指定 api_url 时压测运行中的服务"""
+    if api_url:
+        import httpx
+
+        client = httpx.Client(timeout=120)
+
+        def call(q: str):
+            resp = client.post(f"{api_url.rstrip('/')}/rag/base", params={"message": q})
+            resp.raise_for_status()
+    else:
+        from agentic_rag_test.agentic_rag.llm_factory import LLMClient
+        from agentic_rag_test.agentic_rag.tools import base_rag
+
+        base_rag.qdrant_manager.search_pages = timer.wrap("search", base_rag.qdrant_manager.search_pages)
+        LLMClient.chat_messages = timer.wrap("generate", LLMClient.chat_messages)
+
+        def call(q: str):
+            base_rag.ask_base_rag(q)
+
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def timed(i: int):
+        nonlocal errors
+        q = SENTENCES[i % len(SENTENCES)][:20]
+        start = time.perf_counter()
+        try:
+            call(q)
+        except Exception:
+            with lock:
+                errors += 1
+            return
+        with lock:
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(timed, range(queries)))
+    elapsed = time.perf_counter() - start
+    summary = latency_summary(latencies)
+    summary.update({
+        "concurrency": concurrency,
+        "errors": errors,
+        "qps": round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+    })
+    return summary
+
+
+def compare(current: Dict[str, Any], baseline_path: str) -> None:
+    """打印与历史结果的关键指标差异"""
+    baseline = json.loads(Path(baseline_path).read_text(encoding="utf-8"))
+    rows = [
+        ("ingestion.pages_per_sec", lambda r: r["ingestion"]["pages_per_sec"]),
+        ("query.p50_ms", lambda r: r["query"]["p50_ms"]),
+        ("query.p99_ms", lambda r: r["query"]["p99_ms"]),
+        ("peak_rss_mb", lambda r: r["peak_rss_mb"]),
+        ("server_rss_mb", lambda r: r["server_rss_mb"]),
+        ("llm_tokens.prompt", lambda r: r["llm_tokens"]["prompt"]),
+        ("llm_tokens.cache_hit_ratio", lambda r: r["llm_tokens"]["cache_hit_ratio"]),
+    ]
+    for stage in sorted(set(current["stages"]) | set(baseline.get("stages", {}))):
+        rows.append((f"stages.{stage}.p50_ms", lambda r, s=stage: r["stages"][s]["p50_ms"]))
+    print(f"\n对比基线 {baseline.get('commit')} → 当前 {current.get('commit')}")
+    for name, get in rows:
+        try:
+            old, new = get(baseline), get(current)
+        except KeyError:
+            continue
+        if old is None or new is None:
+            continue
+        delta = (new - old) / old * 100 if old else 0.0
+        print(f"  {name:<32} {old:>10} → {new:>10}  ({delta:+.1f}%)")
+
+
+def main(argv: List[str] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="Agentic RAG 离线压测")
+    parser.add_argument("--pdfs", type=int, default=5)
+    parser.add_argument("--pages", type=int, default=10, help="每个文档页数")
+    parser.add_argument("--pptx", type=int, default=0, help="PPTX 数量（需要 LibreOffice）")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--jitter-ms", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--port", type=int, default=18080)
+    parser.add_argument("--api-url", default=None, help="压测运行中的服务（如 http://localhost:8000）")
+    parser.add_argument("--out", default="benchmark_results")
+    parser.add_argument("--compare", default=None, help="历史结果 JSON 路径")
+    args = parser.parse_args(argv)
+
+    stub_cfg = StubConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+    )
+    # 指定 --api-url 时被测服务自行配置外部依赖（可指向这里拉起的 stub）
+    stub = StubServer(stub_cfg, port=args.port)
+    stub.start()
+    if not args.api_url:
+        configure_env(stub.base_url)
+    timer = StageTimer()
+    try:
+        if args.api_url:
+            metrics_before = scrape_metrics(args.api_url)
+        with tempfile.TemporaryDirectory(prefix="bench_corpus_") as corpus_dir:
+            files = generate_corpus(Path(corpus_dir), args.pdfs, args.pages, args.pptx)
+            if args.api_url:
+                ingestion = run_api_ingestion(files, args.api_url)
+            else:
+                ingestion = run_ingestion(files, timer)
+        query = run_queries(args.queries, args.concurrency, timer, args.api_url)
+    finally:
+        stub.stop()
+
+    if args.api_url:
+        # 阶段耗时只在进程内可测；服务端分阶段延迟见其 /metrics 的 rag_stage_latency_seconds
+        metrics_after = scrape_metrics(args.api_url)
+        llm_tokens = metrics_delta(metrics_before, metrics_after, "llm_tokens.")
+        if llm_tokens.get("prompt"):
+            llm_tokens["cache_hit_ratio"] = round(llm_tokens.get("cached", 0.0) / llm_tokens["prompt"], 4)
+        # 服务端只暴露当前 RSS（process_resident_memory_bytes），没有峰值
+        rss = metrics_after.get("rss_bytes")
+        memory = {"server_rss_mb": round(rss / 1024 / 1024, 1) if rss else None}
+    else:
+        llm_tokens = llm_token_totals()
+        memory = {"peak_rss_mb": peak_rss_mb()}
+
+    result = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": vars(args),
+        "ingestion": ingestion,
+        "query": query,
+        "stages": timer.summary(),
+        "llm_tokens": llm_tokens,
+        **memory,
+    }
+    out_dir = Path(args.out)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out_path = out_dir / f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{result['commit']}.json"
+    out_path.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    print(f"结果已保存: {out_path}")
+    if args.compare:
+        compare(result, args.compare)
+    return result
+
+
+if __name__ == "__main__":
+    main()
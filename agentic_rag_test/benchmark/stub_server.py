@@ -0,0 +1,221 @@
+"""
+本地 OpenAI 兼容 stub 服务 - 离线压测时替代 DashScope / DeepSeek / Moonshot
+支持 chat.completions（含模拟前缀缓存命中 token）、embeddings、files（Kimi 文件提取），可配置延迟、错误率与 429 比例
+
+用法（独立进程，压测入口会自动拉起）：
+    python -m agentic_rag_test.agentic_rag.benchmark.stub_server --port 18080 --latency-ms 200
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import subprocess
+import sys
+import time
+import urllib.request
+import uuid
+from dataclasses import dataclass, fields
+
+import uvicorn
+from fastapi import FastAPI, Request, UploadFile, File, Form
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+EMBED_DIM = 1024
+PREFIX_BLOCK = 64  # 前缀缓存粒度（字符），模拟服务端按块命中
+
+
+@dataclass
+class StubConfig:
+    latency_ms: float = 200.0  # 平均延迟
+    jitter_ms: float = 50.0  # 延迟抖动
+    error_rate: float = 0.0  # 500 比例
+    rate_limit_rate: float = 0.0  # 429 比例
+    summary_chars: int = 200  # 摘要/回答长度
+    ocr_chars: int = 1500  # OCR 返回文本长度
+
+
+def fake_embedding(text: str, dim: int = EMBED_DIM) -> list:
+    """字符二元组哈希向量：确定性、非负，相近文本余弦相似度更高"""
+    vec = [0.0] * dim
+    text = text or " "
+    for i in range(max(len(text) - 1, 1)):
+        h = int(hashlib.md5(text[i:i + 2].encode("utf-8")).hexdigest()[:8], 16)
+        vec[h % dim] += 1.0
+    norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+    return [v / norm for v in vec]
+
+
+def _filler(seed: str, n: int) -> str:
+    words = ["营收", "同比增长", "毛利率", "市场份额", "研发投入", "净利润", "行业景气", "产能", "估值", "现金流"]
+    rnd = random.Random(seed)
+    out = ""
+    while len(out) < n:
+        out += rnd.choice(words) + "，"
+    return out[:n]
+
+
+def create_stub_app(cfg: StubConfig) -> FastAPI:
+    app = FastAPI(title="OpenAI-compatible stub")
+    files = {}
+    prefix_cache = set()
+    stats = {"requests": 0, "errors": 0, "rate_limited": 0}
+
+    def cache_hit_chars(prompt: str) -> int:
+        """模拟上下文缓存：返回已见过的最长块对齐前缀长度，并登记本次请求的所有前缀块"""
+        hit = 0
+        for end in range(PREFIX_BLOCK, len(prompt) + 1, PREFIX_BLOCK):
+            key = hashlib.md5(prompt[:end].encode("utf-8")).hexdigest()
+            if key in prefix_cache and hit == end - PREFIX_BLOCK:
+                hit = end
+            prefix_cache.add(key)
+        return hit
+
+    @app.middleware("http")
+    async def inject_faults(request: Request, call_next):
+        stats["requests"] += 1
+        delay = max(cfg.latency_ms + random.uniform(-cfg.jitter_ms, cfg.jitter_ms), 0)
+        await asyncio.sleep(delay / 1000)
+        roll = random.random()
+        if roll < cfg.rate_limit_rate:
+            stats["rate_limited"] += 1
+            return JSONResponse(
+                {"error": {"message": "rate limited", "type": "rate_limit_error"}},
+                status_code=429,
+                headers={"Retry-After": "0"},
+            )
+        if roll < cfg.rate_limit_rate + cfg.error_rate:
+            stats["errors"] += 1
+            return JSONResponse({"error": {"message": "stub error", "type": "server_error"}}, status_code=500)
+        return await call_next(request)
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        prompt = json.dumps(body.get("messages", []), ensure_ascii=False)
+        prompt_tokens = max(len(prompt) // 2, 1)
+        cached_tokens = min(cache_hit_chars(prompt) // 2, prompt_tokens)
+        content = _filler(prompt[-64:], cfg.summary_chars)
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(content),
+                "total_tokens": prompt_tokens + len(content),
+                "prompt_cache_hit_tokens": cached_tokens,
+                "prompt_cache_miss_tokens": prompt_tokens - cached_tokens,
+            },
+        }
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        inputs = body.get("input")
+        inputs = inputs if isinstance(inputs, list) else [inputs]
+        dim = int(body.get("dimensions") or EMBED_DIM)
+        return {
+            "object": "list",
+            "model": body.get("model", "stub"),
+            "data": [
+                {"object": "embedding", "index": i, "embedding": fake_embedding(str(t), dim)}
+                for i, t in enumerate(inputs)
+            ],
+            "usage": {"prompt_tokens": 1, "total_tokens": 1},
+        }
+
+    @app.post("/v1/files")
+    async def create_file(file: UploadFile = File(...), purpose: str = Form("file-extract")):
+        data = await file.read()
+        file_id = f"file-{uuid.uuid4().hex}"
+        files[file_id] = _filler(hashlib.md5(data).hexdigest(), cfg.ocr_chars)
+        return {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(data),
+            "created_at": int(time.time()),
+            "filename": file.filename,
+            "purpose": purpose,
+            "status": "processed",
+        }
+
+    @app.get("/v1/files/{file_id}/content")
+    async def file_content(file_id: str):
+        return PlainTextResponse(json.dumps({"content": files.get(file_id, "")}, ensure_ascii=False))
+
+    @app.delete("/v1/files/{file_id}")
+    async def delete_file(file_id: str):
+        files.pop(file_id, None)
+        return {"id": file_id, "object": "file", "deleted": True}
+
+    return app
+
+
+class StubServer:
+    """在独立子进程中运行 stub 服务，压测进程的峰值内存不含 stub"""
+
+    def __init__(self, cfg: StubConfig, host: str = "127.0.0.1", port: int = 18080):
+        self.cfg = cfg
+        self.host = host
+        self.port = port
+        self.process = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    def start(self, wait: float = 10.0):
+        args = [sys.executable, "-m", __spec__.name, "--host", self.host, "--port", str(self.port)]
+        for f in fields(self.cfg):
+            args += [f"--{f.name.replace('_', '-')}", str(getattr(self.cfg, f.name))]
+        self.process = subprocess.Popen(args)
+        deadline = time.monotonic() + wait
+        while True:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"stub 服务启动失败，退出码 {self.process.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://{self.host}:{self.port}/stats", timeout=1):
+                    return
+            except OSError:
+                pass
+            if time.monotonic() > deadline:
+                self.stop()
+                raise RuntimeError("stub 服务启动超时")
+            time.sleep(0.05)
+
+    def stop(self):
+        if self.process is None or self.process.poll() is not None:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+def main(argv: list = None) -> None:
+    parser = argparse.ArgumentParser(description="本地 OpenAI 兼容 stub 服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=18080)
+    for f in fields(StubConfig):
+        parser.add_argument(f"--{f.name.replace('_', '-')}", type=f.type, default=f.default)
+    args = parser.parse_args(argv)
+    cfg = StubConfig(**{f.name: getattr(args, f.name) for f in fields(StubConfig)})
+    uvicorn.run(create_stub_app(cfg), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+"""
+离线批量入库 CLI - 首次回填大量报告时替代 /upload/zip
+extract：遍历目录，复用 FileProcessor 的转换/摘要/OCR/向量化，写出可续跑的中间分片（Parquet 元数据 + .npy 向量）
+load：导入到暂存物理集合（复制线上数据 + 暂停 HNSW 建索引并行导入分片），恢复索引后追平并原子切换别名
+
+用法：
+    python -m agentic_rag_test.agentic_rag.bulk_load extract --src ./reports --out ./shards --file-workers 4
+    python -m agentic_rag_test.agentic_rag.bulk_load load --shards ./shards --parallel 4
+    python -m agentic_rag_test.agentic_rag.bulk_load run --src ./reports --out ./shards
+"""
+import argparse
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from qdrant_client.models import PointIdsList, PointStruct
+
+from agentic_rag_test.agentic_rag.file_processor import DOC_EXTS, IMG_EXTS, FileProcessor
+from agentic_rag_test.agentic_rag.passages import SUMMARY_VECTOR, passage_id, passage_metadata
+from agentic_rag_test.agentic_rag.qdrant_manager import (
+    ALIAS_REFRESH_SECONDS,
+    QDRANT_MANAGER,
+    passages_of,
+    physical_collection_name,
+)
+from agentic_rag_test.agentic_rag.reindex import PAGES_ONLY, ReindexLock
+
+EXTRACT_CHECKPOINT = "extract_checkpoint.json"
+LOAD_CHECKPOINT = "load_checkpoint.json"
+
+
+def point_id(rel_path: str, page_index: int) -> str:
+    """点 ID 由 (相对路径, 页码) 确定，重复导入覆盖而非重复"""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"bulk/{rel_path}/{page_index}"))
+
+
+def _read_json(path: Path, default: Dict[str, Any]) -> Dict[str, Any]:
+    if path.exists():
+        return json.loads(path.read_text(encoding="utf-8"))
+    return default
+
+
+def _write_json(path: Path, data: Dict[str, Any]) -> None:
+    """先写临时文件再替换，避免中断时检查点损坏"""
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(data, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+class ShardWriter:
+    """缓冲页面结果，满 shard_size 页写出一个分片并推进检查点"""
+
+    def __init__(self, out_dir: Path, shard_size: int):
+        self.out_dir = out_dir
+        self.shard_size = shard_size
+        self.checkpoint_path = out_dir / EXTRACT_CHECKPOINT
+        self.state = _read_json(
+            self.checkpoint_path, {"done_files": [], "failed_files": {}, "next_shard": 0, "pages": 0}
+        )
+        self.lock = threading.Lock()
+        self.rows: List[Dict[str, Any]] = []
+        self.vectors: List[List[float]] = []
+        self.pending_files: List[str] = []
+
+    def add_file(self, rel_path: str, rows: List[Dict[str, Any]], vectors: List[List[float]]) -> None:
+        with self.lock:
+            self.rows.extend(rows)
+            self.vectors.extend(vectors)
+            self.pending_files.append(rel_path)
+            if len(self.rows) >= self.shard_size:
+                self._flush()
+
+    def add_failure(self, rel_path: str, error: str) -> None:
+        with self.lock:
+            self.state["failed_files"][rel_path] = error
+            _write_json(self.checkpoint_path, self.state)
+
+    def flush(self) -> None:
+        with self.lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self.pending_files and not self.rows:
+            # 整个文件都被跳过（空白/重复页），无需写分片但要记入检查点
+            self.state["done_files"].extend(self.pending_files)
+            self.pending_files = []
+            _write_json(self.checkpoint_path, self.state)
+            return
+        if not self.rows:
+            return
+        name = f"shard_{self.state['next_shard']:05d}"
+        pq.write_table(pa.Table.from_pylist(self.rows), self.out_dir / f"{name}.parquet")
+        np.save(self.out_dir / f"{name}.npy", np.asarray(self.vectors, dtype=np.float32))
+        self.state["next_shard"] += 1
+        self.state["pages"] += sum(1 for row in self.rows if row.get("kind", "page") == "page")
+        self.state["done_files"].extend(self.pending_files)
+        for rel_path in self.pending_files:
+            self.state["failed_files"].pop(rel_path, None)
+        _write_json(self.checkpoint_path, self.state)
+        print(f"[INFO] 写出 {name}：{len(self.rows)} 点，累计 {self.state['pages']} 页")
+        self.rows, self.vectors, self.pending_files = [], [], []
+
+
+def extract_file(processor: FileProcessor, path: Path, rel_path: str):
+    """单个文件：拆页 → 摘要/OCR/向量化，返回 (行, 向量)，页面行后紧跟其段落行"""
+    content = path.read_bytes()
+    doc_name = os.path.splitext(path.name)[0]
+    if path.suffix.lower() in IMG_EXTS:
+        pages = [{"image_index": 0, "image": content, "text_layer": None, "vlm_image": None, "mime": None}]
+    else:
+        pages = processor.prepare_pages(content, path.name)["pages"]
+    futures = [
+        processor.submit_page(
+            processor.analyze_page, p["image"], p["image_index"], doc_name, path.name,
+            p["text_layer"], p["vlm_image"], p["mime"],
+        )
+        for p in pages
+    ]
+    rows, vectors = [], []
+    for f in futures:
+        vector, metadata = f.result()
+        metadata["filename"] = rel_path
+        passages = metadata.pop("passages", [])
+        page_id = point_id(rel_path, metadata["image_index"])
+        rows.append({
+            "id": page_id,
+            "kind": "page",
+            "filename": rel_path,
+            "image_index": metadata["image_index"],
+            "metadata": json.dumps(metadata, ensure_ascii=False),
+        })
+        vectors.append(vector)
+        # 段落作为独立行写入分片（向量进 .npy），load 时按 kind 写入 passage 命名向量
+        for passage in passages:
+            rows.append({
+                "id": passage_id(page_id, passage["index"]),
+                "kind": "passage",
+                "filename": rel_path,
+                "image_index": metadata["image_index"],
+                "metadata": json.dumps(
+                    passage_metadata(metadata, passage["index"], passage["text"], page_id), ensure_ascii=False
+                ),
+            })
+            vectors.append(passage["vector"])
+    return rows, vectors
+
+
+def extract(src: Path, out_dir: Path, file_workers: int = 4, shard_size: int = 500, retry_failed: bool = False) -> None:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    writer = ShardWriter(out_dir, shard_size)
+    done = set(writer.state["done_files"])
+    failed = set(writer.state["failed_files"]) if not retry_failed else set()
+    files = []
+    for path in sorted(src.rglob("*")):
+        if not path.is_file() or not path.name.lower().endswith(DOC_EXTS + IMG_EXTS):
+            continue
+        rel_path = path.relative_to(src).as_posix()
+        if rel_path not in done and rel_path not in failed:
+            files.append((path, rel_path))
+    print(f"[INFO] 待处理 {len(files)} 个文件（已完成 {len(done)}，已失败 {len(failed)}）")
+
+    processor = FileProcessor(qdrant_manager=None)
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=file_workers) as pool:
+            futures = {pool.submit(extract_file, processor, p, rel): rel for p, rel in files}
+            for f in as_completed(futures):
+                rel_path = futures[f]
+                try:
+                    rows, vectors = f.result()
+                    writer.add_file(rel_path, rows, vectors)
+                except Exception as e:
+                    print(f"[WARN] {rel_path} 失败: {e}")
+                    writer.add_failure(rel_path, str(e))
+        writer.flush()
+    finally:
+        processor.cleanup()
+    elapsed = time.perf_counter() - start
+    print(f"[INFO] extract 完成：{writer.state['pages']} 页，用时 {elapsed:.1f}s")
+
+
+def _scroll_ids(client, collection: str, scroll_filter=None, batch_size: int = 256):
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=collection,
+            limit=batch_size,
+            offset=offset,
+            scroll_filter=scroll_filter,
+            with_payload=False,
+            with_vectors=False,
+        )
+        yield [p.id for p in points]
+        if offset is None:
+            break
+
+
+def _copy_points(qdrant_manager: QDRANT_MANAGER, source: str, target: str,
+                 ids: List[str] = None, scroll_filter=None, batch_size: int = 256) -> int:
+    """把 source 中的点连同向量原样复制到 target（同一 embedding 模型，无需重嵌入）；旧单向量集合的向量写为 summary"""
+    client = qdrant_manager.client
+    named = qdrant_manager.is_named(source)
+
+    def write(points) -> int:
+        if points:
+            client.upsert(collection_name=target, points=[
+                PointStruct(id=p.id, vector=p.vector if named else {SUMMARY_VECTOR: p.vector}, payload=p.payload)
+                for p in points
+            ])
+        return len(points)
+
+    copied = 0
+    if ids is not None:
+        for i in range(0, len(ids), batch_size):
+            copied += write(client.retrieve(source, ids=ids[i:i + batch_size], with_payload=True, with_vectors=True))
+        return copied
+    offset = None
+    while True:
+        points, offset = client.scroll(
+            collection_name=source,
+            limit=batch_size,
+            offset=offset,
+            scroll_filter=scroll_filter,
+            with_payload=True,
+            with_vectors=True,
+        )
+        copied += write(points)
+        if offset is None:
+            return copied
+
+
+def _catch_up(qdrant_manager: QDRANT_MANAGER, source: str, staging: str, shard_ids: set) -> None:
+    """补齐导入期间其他进程写入 source 的页面（连同段落），删除期间已从 source 删除、且不来自分片的页面"""
+    client = qdrant_manager.client
+    for ids in _scroll_ids(client, source, PAGES_ONLY):
+        present = {p.id for p in client.retrieve(staging, ids=ids, with_payload=False)} if ids else set()
+        missing = [i for i in ids if i not in present]
+        if missing:
+            _copy_points(qdrant_manager, source, staging, ids=missing)
+            _copy_points(qdrant_manager, source, staging, scroll_filter=passages_of(missing))
+    for ids in _scroll_ids(client, staging, PAGES_ONLY):
+        present = {p.id for p in client.retrieve(source, ids=ids, with_payload=False)} if ids else set()
+        removed = [i for i in ids if i not in present and str(i) not in shard_ids]
+        if removed:
+            client.delete(staging, points_selector=PointIdsList(points=removed))
+            qdrant_manager.drop_passages(staging, removed)
+
+
+def _staging_spec(shards: List[Path]) -> Dict[str, Any]:
+    """分片的 embedding 模型与维度（取第一个页面行与向量文件）"""
+    rows = pq.read_table(shards[0], columns=["kind", "metadata"]).to_pylist()
+    page = next(json.loads(r["metadata"]) for r in rows if r["kind"] == "page")
+    dim = np.load(shards[0].with_suffix(".npy"), mmap_mode="r").shape[1]
+    return {"model": page.get("embedding_model"), "dim": int(dim)}
+
+
+def load(shard_dir: Path, parallel: int = 4, batch_size: int = 256) -> None:
+    """
+    导入到暂存物理集合：复制线上现有数据 → 暂停建索引并行导入分片 → 恢复索引 → 追平 → 原子切换别名 → 再追平
+    导入期间线上别名仍指向原集合，检索不受未建索引的影响；旧集合保留，确认无误后可手动删除
+    """
+    checkpoint_path = shard_dir / LOAD_CHECKPOINT
+    state = _read_json(checkpoint_path, {"loaded_shards": [], "points": 0})
+    shards = [p for p in sorted(shard_dir.glob("shard_*.parquet")) if p.stem not in state["loaded_shards"]]
+    if not shards:
+        print("[INFO] 没有待导入的分片")
+        return
+    # 与重建索引共用 advisory lock：两者都从线上集合复制并切换同一别名，并发时后切换的一方会丢弃另一方的集合；
+    # 在解析别名前加锁，保证复制源就是切换时的线上集合
+    lock = ReindexLock()
+    if not lock.acquire():
+        raise SystemExit("已有重建索引或批量导入任务在运行，请稍后再试")
+    try:
+        qdrant_manager = QDRANT_MANAGER()
+        client = qdrant_manager.client
+        alias = qdrant_manager.collection_name
+        source = qdrant_manager.resolve_collection()
+        active = qdrant_manager.active()
+        if source == alias:
+            raise SystemExit(f"{alias} 为旧式物理集合，无法切换别名，请先执行一次重建索引迁移为别名")
+        spec = _staging_spec(shards)
+        if (spec["model"], spec["dim"]) != (active["model"], active["dim"]):
+            raise SystemExit(
+                f"分片 embedding（{spec['model']}/{spec['dim']}）与当前集合（{active['model']}/{active['dim']}）不一致，"
+                "请先重建索引或用当前模型重新 extract"
+            )
+
+        # 续跑时沿用检查点中的暂存集合；先前已导入的分片已在线上集合中，随复制进入暂存集合
+        staging = state.get("staging")
+        if staging is None or staging == source or not client.collection_exists(staging):
+            staging = physical_collection_name(alias, spec["model"], spec["dim"])
+            hnsw = client.get_collection(source).config.hnsw_config  # 沿用线上集合的 HNSW 参数
+            qdrant_manager.create_physical_collection(staging, spec["dim"], hnsw.m, hnsw.ef_construct)
+            state.update(staging=staging, staging_copied=False, staging_shards=[])
+            _write_json(checkpoint_path, state)
+        if not state["staging_copied"]:
+            print(f"[INFO] 复制 {source} → 暂存集合 {staging}")
+            _copy_points(qdrant_manager, source, staging, batch_size=batch_size)
+            state["staging_copied"] = True
+            _write_json(checkpoint_path, state)
+        previous_threshold = qdrant_manager.disable_indexing(collection=staging)
+        start = time.perf_counter()
+        loaded = 0
+        try:
+            for shard in shards:
+                table = pq.read_table(shard).to_pylist()
+                vectors = np.load(shard.with_suffix(".npy"))
+                loaded += qdrant_manager.upload_bulk(
+                    ids=[row["id"] for row in table],
+                    vectors=vectors.tolist(),
+                    metadatas=[json.loads(row["metadata"]) for row in table],
+                    parallel=parallel,
+                    batch_size=batch_size,
+                    collection=staging,
+                )
+                state["loaded_shards"].append(shard.stem)
+                state["staging_shards"].append(shard.stem)
+                state["points"] += len(table)
+                _write_json(checkpoint_path, state)
+                elapsed = time.perf_counter() - start
+                print(f"[INFO] 导入 {shard.stem}：累计 {loaded} 点，{loaded / elapsed:.0f} 点/秒")
+        finally:
+            print("[INFO] 恢复索引并等待重建…")
+            qdrant_manager.enable_indexing(previous_threshold, collection=staging)
+
+        shard_ids = set()
+        for name in state["staging_shards"]:
+            shard_ids.update(pq.read_table(shard_dir / f"{name}.parquet", columns=["id"]).column("id").to_pylist())
+        print("[INFO] 追平导入期间的线上写入并切换别名…")
+        _catch_up(qdrant_manager, source, staging, shard_ids)
+        qdrant_manager.swap_alias(staging)
+        # 等各进程刷新别名缓存后，补齐切换窗口内仍写入旧集合的数据
+        time.sleep(ALIAS_REFRESH_SECONDS * 2)
+        _catch_up(qdrant_manager, source, staging, shard_ids)
+        for key in ("staging", "staging_copied", "staging_shards"):
+            state.pop(key)
+        _write_json(checkpoint_path, state)
+        print(f"[INFO] load 完成：{loaded} 点，用时 {time.perf_counter() - start:.1f}s；别名 {alias} → {staging}，旧集合 {source} 保留")
+    finally:
+        lock.release()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agentic RAG 离线批量入库")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_extract = sub.add_parser("extract", help="目录 → 中间分片")
+    p_load = sub.add_parser("load", help="中间分片 → Qdrant")
+    p_run = sub.add_parser("run", help="extract + load")
+    for p in (p_extract, p_run):
+        p.add_argument("--src", required=True, type=Path)
+        p.add_argument("--out", required=True, type=Path)
+        p.add_argument("--file-workers", type=int, default=4)
+        p.add_argument("--shard-size", type=int, default=500)
+        p.add_argument("--retry-failed", action="store_true")
+    p_load.add_argument("--shards", required=True, type=Path)
+    for p in (p_load, p_run):
+        p.add_argument("--parallel", type=int, default=4)
+        p.add_argument("--batch-size", type=int, default=256)
+    args = parser.parse_args()
+
+    if args.command in ("extract", "run"):
+        extract(args.src, args.out, args.file_workers, args.shard_size, args.retry_failed)
+    if args.command == "load":
+        load(args.shards, args.parallel, args.batch_size)
+    if args.command == "run":
+        load(args.out, args.parallel, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
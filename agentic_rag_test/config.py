@@ -11,6 +11,11 @@ DASHSCOPE_API_KEY = os.getenv("DASHSCOPE_API_KEY", "")
 DEEPSEEK_API_KEY = os.getenv("DEEPSEEK_API_KEY", "")
 KIMI_API_KEY = os.getenv("KIMI_API_KEY", "")
 
+# OpenAI 兼容接口地址（可指向本地 stub 做离线压测）
+DASHSCOPE_BASE_URL = os.getenv("DASHSCOPE_BASE_URL", "https://dashscope.aliyuncs.com/compatible-mode/v1")
+DEEPSEEK_BASE_URL = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com")
+KIMI_BASE_URL = os.getenv("KIMI_BASE_URL", "https://api.moonshot.cn/v1")
+
 # PostgreSQL 配置
 DATABASE_URL = os.getenv(
     "DATABASE_URL",
@@ -20,8 +25,93 @@ DATABASE_URL = os.getenv(
 # Qdrant 向量数据库配置
 QDRANT_URL = os.getenv("QDRANT_URL", "http://localhost:6333")
 QDRANT_COLLECTION = os.getenv("QDRANT_COLLECTION", "business_reports")
+QDRANT_HNSW_M = int(os.getenv("QDRANT_HNSW_M", "16"))
+QDRANT_HNSW_EF_CONSTRUCT = int(os.getenv("QDRANT_HNSW_EF_CONSTRUCT", "100"))
+QDRANT_PATH = os.getenv("QDRANT_PATH", "")  # 非空时使用本地模式（目录或 :memory:），忽略 QDRANT_URL
 
 # 文件处理配置
 TEMP_DIR = os.getenv("TEMP_DIR", "temp")
 UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
 MAX_FILE_SIZE = int(os.getenv("MAX_FILE_SIZE", "10485760"))  # 10MB
+
+# 精简 Payload 模式：Qdrant 只保留 id 与小字段，OCR/摘要文本存入压缩侧存储
+QDRANT_SLIM_PAYLOAD = os.getenv("QDRANT_SLIM_PAYLOAD", "false").lower() in ("1", "true", "yes")
+TEXT_STORE_BACKEND = os.getenv("TEXT_STORE_BACKEND", "local")  # local | postgres
+TEXT_STORE_PATH = os.getenv("TEXT_STORE_PATH", "text_store.sqlite3")
+
+# Office 文档转换（libreoffice=常驻无头 LibreOffice 进程池；docx2pdf=依赖 Microsoft Word）
+OFFICE_CONVERTER = os.getenv("OFFICE_CONVERTER", "docx2pdf" if os.name == "nt" else "libreoffice")
+SOFFICE_PATH = os.getenv("SOFFICE_PATH", "soffice")
+LIBREOFFICE_POOL_SIZE = int(os.getenv("LIBREOFFICE_POOL_SIZE", "2"))
+LIBREOFFICE_TIMEOUT = int(os.getenv("LIBREOFFICE_TIMEOUT", "120"))  # 单个文件转换超时（秒）
+
+# 文本层快速通道：文本层达标的页面直接使用 PyMuPDF 提取结果，跳过远程 OCR
+TEXT_LAYER_MIN_CHARS = int(os.getenv("TEXT_LAYER_MIN_CHARS", "50"))
+TEXT_LAYER_MIN_QUALITY = float(os.getenv("TEXT_LAYER_MIN_QUALITY", "0.9"))  # 有效字符占比
+TEXT_LAYER_MAX_IMAGE_RATIO = float(os.getenv("TEXT_LAYER_MAX_IMAGE_RATIO", "0.5"))  # 图片面积占比上限
+
+# 页面图片预处理（VLM 摘要前）
+PAGE_RENDER_ZOOM = float(os.getenv("PAGE_RENDER_ZOOM", "2.0"))  # OCR 与存储用的渲染倍率
+PAGE_MIN_ZOOM = float(os.getenv("PAGE_MIN_ZOOM", "1.0"))  # 稀疏页送 VLM 的等效倍率
+PAGE_MAX_ZOOM = float(os.getenv("PAGE_MAX_ZOOM", "2.0"))  # 密集页送 VLM 的等效倍率
+VLM_MAX_LONG_EDGE = int(os.getenv("VLM_MAX_LONG_EDGE", "1600"))  # 送入 VLM 的长边像素上限
+VLM_IMAGE_FORMAT = os.getenv("VLM_IMAGE_FORMAT", "JPEG")  # JPEG | WEBP | PNG
+VLM_IMAGE_QUALITY = int(os.getenv("VLM_IMAGE_QUALITY", "85"))
+BLANK_INK_RATIO = float(os.getenv("BLANK_INK_RATIO", "0.003"))  # 非白像素占比低于此值视为空白页
+DUPLICATE_HASH_DISTANCE = int(os.getenv("DUPLICATE_HASH_DISTANCE", "6"))  # dHash 汉明距离阈值
+
+# 可观测性：/metrics 始终开启；trace span 需安装 opentelemetry 并开启此项
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() in ("1", "true", "yes")
+
+# /rag/auto 路由阈值（基于一次检索的本地信号选择 Base / Agentic）
+ROUTER_MIN_TOP_SCORE = float(os.getenv("ROUTER_MIN_TOP_SCORE", "0.35"))  # 最高分低于此值视为资料不足
+ROUTER_CONFIDENT_SCORE = float(os.getenv("ROUTER_CONFIDENT_SCORE", "0.6"))  # 最高分高于此值视为可直接回答
+ROUTER_MAX_DOCS_FOR_BASE = int(os.getenv("ROUTER_MAX_DOCS_FOR_BASE", "2"))  # 命中分散到更多文档时倾向 Agent
+ROUTER_FLAT_SPREAD = float(os.getenv("ROUTER_FLAT_SPREAD", "0.05"))  # 最高分与均值差小于此值视为分布平坦
+ROUTER_COMPLEXITY_THRESHOLD = int(os.getenv("ROUTER_COMPLEXITY_THRESHOLD", "2"))  # 问题拆解信号数
+
+# 分布式入库队列（PostgreSQL ingest_tasks 表 + 独立 worker 进程）
+INGEST_WORKER_CONCURRENCY = int(os.getenv("INGEST_WORKER_CONCURRENCY", "4"))  # 单 worker 进程并发任务数
+INGEST_LEASE_SECONDS = int(os.getenv("INGEST_LEASE_SECONDS", "300"))  # 任务租约时长
+INGEST_HEARTBEAT_SECONDS = int(os.getenv("INGEST_HEARTBEAT_SECONDS", "30"))  # 续租间隔
+INGEST_MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", "3"))
+INGEST_POLL_SECONDS = float(os.getenv("INGEST_POLL_SECONDS", "2"))  # 空闲轮询间隔
+
+# Embedding 模型（QDRANT_COLLECTION 为别名，换模型/维度/HNSW 参数通过后台重建 + 别名切换完成）
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-v4")
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "1024"))
+REINDEX_BATCH_SIZE = int(os.getenv("REINDEX_BATCH_SIZE", "256"))  # 每次 scroll/upsert 点数
+REINDEX_EMBED_BATCH = int(os.getenv("REINDEX_EMBED_BATCH", "10"))  # 单次 embedding 请求文本数（DashScope 上限 10）
+REINDEX_EMBED_WORKERS = int(os.getenv("REINDEX_EMBED_WORKERS", "8"))  # 并发 embedding 请求数
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")  # /admin/* 接口凭证（请求头 X-Admin-Token），为空时管理接口禁用
+
+# 多粒度索引：页面摘要向量 + OCR 段落向量（命名向量，段落点 parent_id 指向页面）
+PASSAGE_CHARS = int(os.getenv("PASSAGE_CHARS", "300"))  # 段落目标长度（字）
+PASSAGE_OVERLAP = int(os.getenv("PASSAGE_OVERLAP", "50"))  # 相邻段落重叠字数
+PASSAGE_MIN_CHARS = int(os.getenv("PASSAGE_MIN_CHARS", "20"))  # 过短段落丢弃
+PASSAGE_SEARCH_LIMIT = int(os.getenv("PASSAGE_SEARCH_LIMIT", "24"))  # 段落检索条数
+PASSAGES_PER_PAGE = int(os.getenv("PASSAGES_PER_PAGE", "3"))  # 每个页面最多返回的匹配段落
+
+# 准入控制：每个接口并发上限 + 有界排队，所有接口共享 ADMISSION_TOTAL_SLOTS（单进程）
+ADMISSION_TOTAL_SLOTS = int(os.getenv("ADMISSION_TOTAL_SLOTS", "24"))
+
+
+def _admission_policy(name: str, limit: int, queue: int, max_wait: float, priority: int, deadline: float) -> dict:
+    """读取 ADMISSION_<NAME>_LIMIT / _QUEUE / _MAX_WAIT / _DEADLINE（DEADLINE=0 表示不限时）"""
+    prefix = f"ADMISSION_{name.upper()}"
+    return {
+        "limit": int(os.getenv(f"{prefix}_LIMIT", str(limit))),
+        "queue": int(os.getenv(f"{prefix}_QUEUE", str(queue))),
+        "max_wait": float(os.getenv(f"{prefix}_MAX_WAIT", str(max_wait))),
+        "priority": priority,
+        "deadline": float(os.getenv(f"{prefix}_DEADLINE", str(deadline))) or None,
+    }
+
+
+# priority 越小越优先：便宜的 /rag/base 优先于 Agent 与入库
+ADMISSION_POLICIES = {
+    "base": _admission_policy("base", limit=16, queue=64, max_wait=5, priority=0, deadline=30),
+    "auto": _admission_policy("auto", limit=8, queue=16, max_wait=10, priority=1, deadline=300),
+    "agentic": _admission_policy("agentic", limit=4, queue=8, max_wait=15, priority=2, deadline=600),
+    "upload": _admission_policy("upload", limit=2, queue=4, max_wait=30, priority=3, deadline=0),
+}
@@ -12,6 +12,14 @@ def _ensure_async_url(url: str) -> str:
     return url
 
 
+def ensure_sync_url(url: str) -> str:
+    """同步连接（文本侧存储、重建锁）用的 URL：异步驱动换成 psycopg2"""
+    for prefix in ("postgresql+asyncpg://", "postgresql+psycopg_async://"):
+        if url.startswith(prefix):
+            return url.replace(prefix, "postgresql+psycopg2://", 1)
+    return url
+
+
 ASYNC_DATABASE_URL = _ensure_async_url(DATABASE_URL)
 engine = create_async_engine(ASYNC_DATABASE_URL, echo=False, pool_pre_ping=True)
 AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False, class_=AsyncSession)
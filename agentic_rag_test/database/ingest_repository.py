@@ -0,0 +1,173 @@
+"""入库任务队列读写：建任务、SKIP LOCKED 领取、租约心跳、完成/失败回写"""
+from datetime import timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import and_, case, func, or_, select, update
+from .db import AsyncSessionLocal
+from .ingest_tables import ingest_jobs, ingest_tasks
+
+
+async def create_job(source: str, files: List[Tuple[str, str, bytes]], meta: Optional[Dict[str, Any]] = None) -> int:
+    """创建入库批次，files 为 (filename, kind, 文件字节) 列表，返回 job_id"""
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            result = await session.execute(
+                ingest_jobs.insert().values(source=source, meta=meta)
+            )
+            job_id = result.inserted_primary_key[0]
+            if files:
+                await session.execute(
+                    ingest_tasks.insert(),
+                    [
+                        {"job_id": job_id, "kind": kind, "filename": filename, "data": data, "status": "pending"}
+                        for filename, kind, data in files
+                    ],
+                )
+            return job_id
+
+
+async def claim_task(worker_id: str, lease_seconds: int, max_attempts: int) -> Optional[Dict[str, Any]]:
+    """
+    领取一个任务：pending 或租约过期的 running 任务，FOR UPDATE SKIP LOCKED 保证多 worker 不重复领取
+    页面任务优先于文件任务，尽快完成已拆分的文档
+    """
+    candidate = (
+        select(ingest_tasks.c.id)
+        .where(
+            or_(
+                ingest_tasks.c.status == "pending",
+                and_(ingest_tasks.c.status == "running", ingest_tasks.c.lease_until < func.now()),
+            ),
+            ingest_tasks.c.attempts < max_attempts,
+        )
+        .order_by(ingest_tasks.c.kind.desc(), ingest_tasks.c.id)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    stmt = (
+        update(ingest_tasks)
+        .where(ingest_tasks.c.id == candidate)
+        .values(
+            status="running",
+            worker_id=worker_id,
+            attempts=ingest_tasks.c.attempts + 1,
+            lease_until=func.now() + timedelta(seconds=lease_seconds),
+            heartbeat_at=func.now(),
+            updated_at=func.now(),
+        )
+        .returning(*ingest_tasks.c)
+    )
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            row = (await session.execute(stmt)).mappings().first()
+    return dict(row) if row else None
+
+
+async def heartbeat(task_ids: List[int], worker_id: str, lease_seconds: int) -> None:
+    """续租：延长本 worker 持有任务的租约"""
+    if not task_ids:
+        return
+    stmt = (
+        update(ingest_tasks)
+        .where(
+            ingest_tasks.c.id.in_(task_ids),
+            ingest_tasks.c.worker_id == worker_id,
+            ingest_tasks.c.status == "running",
+        )
+        .values(lease_until=func.now() + timedelta(seconds=lease_seconds), heartbeat_at=func.now())
+    )
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            await session.execute(stmt)
+
+
+async def complete_task(
+    task_id: int,
+    worker_id: str,
+    result: Optional[Dict[str, Any]] = None,
+    new_tasks: Optional[List[Dict[str, Any]]] = None,
+) -> bool:
+    """标记完成并（可选）追加子任务，同一事务；租约已被他人接管时返回 False"""
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            updated = await session.execute(
+                update(ingest_tasks)
+                .where(
+                    ingest_tasks.c.id == task_id,
+                    ingest_tasks.c.worker_id == worker_id,
+                    ingest_tasks.c.status == "running",
+                )
+                .values(status="done", data=None, result=result, lease_until=None, updated_at=func.now())
+            )
+            if updated.rowcount == 0:
+                return False
+            if new_tasks:
+                await session.execute(ingest_tasks.insert(), new_tasks)
+            return True
+
+
+async def fail_task(task_id: int, worker_id: str, error: str, max_attempts: int) -> None:
+    """失败回写：未达重试上限则重新排队，否则标记 failed"""
+    stmt = (
+        update(ingest_tasks)
+        .where(ingest_tasks.c.id == task_id, ingest_tasks.c.worker_id == worker_id)
+        .values(
+            status=case((ingest_tasks.c.attempts >= max_attempts, "failed"), else_="pending"),
+            error=error,
+            lease_until=None,
+            updated_at=func.now(),
+        )
+    )
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            await session.execute(stmt)
+
+
+async def reap_expired(max_attempts: int) -> int:
+    """租约过期且已达重试上限的任务（worker 多次崩溃）标记为 failed，返回数量"""
+    stmt = (
+        update(ingest_tasks)
+        .where(
+            ingest_tasks.c.status == "running",
+            ingest_tasks.c.lease_until < func.now(),
+            ingest_tasks.c.attempts >= max_attempts,
+        )
+        .values(status="failed", error="租约过期且超过重试次数", updated_at=func.now())
+    )
+    async with AsyncSessionLocal() as session:
+        async with session.begin():
+            result = await session.execute(stmt)
+            return result.rowcount
+
+
+async def get_job(job_id: int) -> Optional[Dict[str, Any]]:
+    """查询批次进度：各状态任务数与失败原因"""
+    async with AsyncSessionLocal() as session:
+        job = (await session.execute(
+            select(ingest_jobs).where(ingest_jobs.c.id == job_id)
+        )).mappings().first()
+        if job is None:
+            return None
+        counts = (await session.execute(
+            select(ingest_tasks.c.kind, ingest_tasks.c.status, func.count())
+            .where(ingest_tasks.c.job_id == job_id)
+            .group_by(ingest_tasks.c.kind, ingest_tasks.c.status)
+        )).all()
+        failures = (await session.execute(
+            select(ingest_tasks.c.filename, ingest_tasks.c.page_index, ingest_tasks.c.error)
+            .where(ingest_tasks.c.job_id == job_id, ingest_tasks.c.status == "failed")
+        )).mappings().all()
+    tasks: Dict[str, Dict[str, int]] = {}
+    for kind, status, n in counts:
+        tasks.setdefault(kind, {})[status] = n
+    unfinished = sum(
+        n for by_status in tasks.values() for s, n in by_status.items() if s in ("pending", "running")
+    )
+    return {
+        "id": job["id"],
+        "created_at": job["created_at"].isoformat(),
+        "source": job["source"],
+        "status": "running" if unfinished else "finished",
+        "tasks": tasks,
+        "failures": [dict(f) for f in failures],
+    }
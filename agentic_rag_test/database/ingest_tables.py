@@ -0,0 +1,51 @@
+"""入库任务队列表：ingest_jobs（上传批次）与 ingest_tasks（文件/页面级任务）"""
+from datetime import datetime, timezone
+from sqlalchemy import Column, DateTime, ForeignKey, Index, Integer, LargeBinary, String, Table, Text, func
+from sqlalchemy.dialects.postgresql import JSONB
+from .db import Base, engine
+
+
+def _utcnow() -> datetime:
+    """带时区的当前时间（timezone=True 列不应写入 naive datetime）"""
+    return datetime.now(timezone.utc)
+
+
+ingest_jobs = Table(
+    "ingest_jobs",
+    Base.metadata,
+    Column("id", Integer, primary_key=True),
+    Column("created_at", DateTime(timezone=True), nullable=False, default=_utcnow, server_default=func.now()),
+    Column("source", String(255), nullable=True),
+    Column("meta", JSONB, nullable=True),
+)
+
+# kind: file（转 PDF、渲染、拆分为页面任务）/ page（摘要、OCR、向量化、入库）
+# status: pending → running → done / failed；running 且租约过期的任务会被重新领取
+ingest_tasks = Table(
+    "ingest_tasks",
+    Base.metadata,
+    Column("id", Integer, primary_key=True),
+    Column("job_id", Integer, ForeignKey("ingest_jobs.id", ondelete="CASCADE"), nullable=False),
+    Column("kind", String(16), nullable=False),
+    Column("filename", Text, nullable=False),
+    Column("page_index", Integer, nullable=True),
+    Column("status", String(16), nullable=False, default="pending"),
+    Column("attempts", Integer, nullable=False, default=0),
+    Column("worker_id", String(128), nullable=True),
+    Column("lease_until", DateTime(timezone=True), nullable=True),
+    Column("heartbeat_at", DateTime(timezone=True), nullable=True),
+    Column("data", LargeBinary, nullable=True),
+    Column("params", JSONB, nullable=True),
+    Column("result", JSONB, nullable=True),
+    Column("error", Text, nullable=True),
+    Column("created_at", DateTime(timezone=True), nullable=False, default=_utcnow, server_default=func.now()),
+    Column("updated_at", DateTime(timezone=True), nullable=True),
+    Index("ix_ingest_tasks_claim", "status", "lease_until", "id"),
+    Index("ix_ingest_tasks_job", "job_id", "status"),
+)
+
+
+async def ensure_ingest_tables() -> None:
+    """确保数据库中存在队列表"""
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all, tables=[ingest_jobs, ingest_tasks])
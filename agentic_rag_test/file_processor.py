@@ -2,7 +2,12 @@
 文档/图片处理流水线 - 多模态摘要、OCR、向量化、入库
 支持 PDF、DOCX、PPTX、DOC 及多种图片格式
 """
+import os
+import tempfile
+import unicodedata
+from pathlib import Path
 from pdf2image import convert_from_path
+import fitz
 from PIL import Image
 import base64
 from openai import OpenAI
@@ -10,23 +15,43 @@ import json
 import docx
 from docx2pdf import convert
 import io
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from typing import List, Dict, Any
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Tuple
 import threading
 import shutil
 from datetime import datetime
 from pptx import Presentation
 from PIL import ImageDraw, ImageFont
 from agentic_rag_test.agentic_rag.llm_factory import LLMClient
+from agentic_rag_test.agentic_rag.config import (
+    EMBEDDING_DIM,
+    EMBEDDING_MODEL,
+    KIMI_API_KEY,
+    KIMI_BASE_URL,
+    OFFICE_CONVERTER,
+    PAGE_RENDER_ZOOM,
+    TEXT_LAYER_MAX_IMAGE_RATIO,
+    TEXT_LAYER_MIN_CHARS,
+    TEXT_LAYER_MIN_QUALITY,
+)
+from agentic_rag_test.agentic_rag.office_converter import PDF_FILTERS, get_office_pool
+from agentic_rag_test.agentic_rag.metrics import PAGES, QUEUE_DEPTH, STAGE_ERRORS, record_cache, timed
+from agentic_rag_test.agentic_rag.image_preprocessor import PagePreprocessor, encode_for_vlm, vlm_scale
+from agentic_rag_test.agentic_rag.passages import split_passages
+from dotenv import load_dotenv
 load_dotenv()
 
+DOC_EXTS = (".pdf", ".docx", ".pptx", ".doc")
+IMG_EXTS = (".png", ".jpg", ".jpeg", ".bmp", ".gif", ".webp", ".tiff", ".tif")
+
 # Kimi OCR 客户端（月之暗面 API）
 kimi_client = OpenAI(
     api_key=KIMI_API_KEY,
-    base_url="https://api.moonshot.cn/v1",
+    base_url=KIMI_BASE_URL,
 )
 
 
+@timed("ocr")
 def kimi_file_upload(file_path: str) -> str:
     """使用 Kimi 文件提取 API 进行 OCR"""
     try:
@@ -37,16 +62,44 @@ def kimi_file_upload(file_path: str) -> str:
         kimi_client.files.delete(file_id=file_object.id)
         return json.loads(content).get("content", "")
     except Exception as e:
+        # 异常在此吞掉，timed("ocr") 看不到，需单独计数
+        STAGE_ERRORS.labels("ocr").inc()
         print(f"[WARN] Kimi OCR 失败: {e}")
         return ""
 
 
+def text_quality(text: str) -> float:
+    """
+    文本层质量：可见字符中有效字符占比
+    只有控制字符、替换符 U+FFFD 与私用区字符（字体缺少 ToUnicode 映射时的典型乱码）计为无效，
+    带重音的拉丁字母（法/德/西语等）属正常文字
+    """
+    visible = [c for c in text if not c.isspace()]
+    if not visible:
+        return 0.0
+    bad = sum(1 for c in visible if c == "\ufffd" or unicodedata.category(c) in ("Cc", "Co"))
+    return 1 - bad / len(visible)
+
+
+def ocr_decision(text_layer: Dict[str, Any]) -> str:
+    """根据文本层指标决定该页文本来源：text_layer 或 kimi"""
+    if not text_layer:
+        return "kimi"
+    if text_layer["chars"] < TEXT_LAYER_MIN_CHARS:
+        return "kimi"
+    if text_layer["quality"] < TEXT_LAYER_MIN_QUALITY:
+        return "kimi"
+    if text_layer["image_ratio"] > TEXT_LAYER_MAX_IMAGE_RATIO:
+        return "kimi"
+    return "text_layer"
+
+
 class FileProcessor:
     """文档处理：PDF/DOCX/PPT 转图片 → 摘要 → OCR → 向量化 → 写入 Qdrant"""
 
     def __init__(self, qdrant_manager):
         self.ai_models = LLMClient(provider="qwen-cn", model="qwen-vl-max")
-        self.qwen_embedding = LLMClient(provider="qwen-cn", model="text-embedding-v4")
+        self.qwen_embedding = LLMClient(provider="qwen-cn", model=EMBEDDING_MODEL, dimensions=EMBEDDING_DIM)
         self.qdrant_manager = qdrant_manager
         self.executor = ThreadPoolExecutor(max_workers=10)
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
@@ -103,11 +156,14 @@ class FileProcessor:
             images.append(img)
         return images
 
+    @timed("convert")
     def convert_to_pdf(self, file_content: bytes, filename: str) -> bytes:
-        """DOCX/PPTX 转 PDF，PDF 直接返回"""
+        """DOC/DOCX/PPT/PPTX 转 PDF，PDF 直接返回"""
         ext = os.path.splitext(filename)[1].lower()
         if ext == ".pdf":
             return file_content
+        if OFFICE_CONVERTER == "libreoffice" and ext in PDF_FILTERS:
+            return get_office_pool().convert_to_pdf(file_content, ext)
         temp_in = tempfile.NamedTemporaryFile(suffix=ext, delete=False)
         temp_out = tempfile.NamedTemporaryFile(suffix=".pdf", delete=False)
         try:
@@ -133,64 +189,157 @@ class FileProcessor:
             if os.path.exists(temp_out.name):
                 os.remove(temp_out.name)
 
+    @timed("render")
     def pdf_to_images(self, pdf_content: bytes) -> List[bytes]:
-        """PDF 每页转 PNG 字节"""
-        tmp = tempfile.NamedTemporaryFile(suffix=".pdf", delete=False)
-        tmp.write(pdf_content)
-        tmp.close()
-        try:
-            doc = fitz.open(tmp.name)
-            images = [
-                doc[page].get_pixmap(matrix=fitz.Matrix(2, 2)).tobytes("png")
-                for page in range(len(doc))
-            ]
-            doc.close()
-            return images
-        finally:
-            os.remove(tmp.name)
+        """PDF 每页按 PAGE_RENDER_ZOOM 转 PNG 字节（供 OCR 与存储；送 VLM 的副本在预处理时缩小）"""
+        images = []
+        with fitz.open(stream=pdf_content, filetype="pdf") as doc:
+            for page in doc:
+                images.append(page.get_pixmap(matrix=fitz.Matrix(PAGE_RENDER_ZOOM, PAGE_RENDER_ZOOM)).tobytes("png"))
+        return images
 
-    def process_single_image(
+    @timed("text_layer")
+    def extract_text_layers(self, pdf_content: bytes) -> List[Dict[str, Any]]:
+        """用 PyMuPDF 提取每页文本层及其覆盖/质量指标"""
+        layers = []
+        with fitz.open(stream=pdf_content, filetype="pdf") as doc:
+            for page in doc:
+                text = page.get_text("text").strip()
+                page_area = abs(page.rect) or 1.0
+                image_area = 0.0
+                for info in page.get_image_info():
+                    image_area += abs(fitz.Rect(info["bbox"]) & page.rect)
+                layers.append({
+                    "text": text,
+                    "chars": len("".join(text.split())),
+                    "quality": round(text_quality(text), 4),
+                    "image_ratio": round(min(image_area / page_area, 1.0), 4),
+                })
+        return layers
+
+    def analyze_page(
         self,
         image_data: bytes,
         image_index: int,
         doc_name: str,
         filename: str,
-    ) -> Dict[str, Any]:
-        """单页：摘要 → OCR → 向量化 → 写入 Qdrant"""
+        text_layer: Dict[str, Any] = None,
+        vlm_image: bytes = None,
+        mime: str = None,
+    ) -> Tuple[List[float], Dict[str, Any]]:
+        """
+        单页：摘要 → OCR（文本层达标则跳过）→ 摘要与 OCR 段落向量化，返回 (摘要向量, 元数据)，不写入 Qdrant
+        元数据 passages 为 [{"index", "text", "vector"}]，由 QDRANT_MANAGER 写为段落点
+        """
         image_filename = f"page_{image_index + 1}.png"
         image_path = self.save_image(image_data, image_filename, doc_name)
-        base64_image = base64.b64encode(image_data).decode("utf-8")
+        if vlm_image is None:
+            # 队列 page 任务只带文本层：按同样的密度缩放重新编码，与同步入库送 VLM 的副本一致
+            vlm_image, mime = encode_for_vlm(Image.open(io.BytesIO(image_data)), vlm_scale(text_layer))
+        base64_image = base64.b64encode(vlm_image).decode("utf-8")
         summary_text = self.ai_models.qwen_vision(
             base64_image,
             "请对图片做摘要，提取核心内容，200 字以内，直接输出摘要。",
+            mime=mime,
         )
-        tmp_img = tempfile.NamedTemporaryFile(suffix=".png", delete=False)
-        tmp_img.write(image_data)
-        tmp_img.close()
-        try:
-            origin_text = kimi_file_upload(tmp_img.name)
-        finally:
-            os.remove(tmp_img.name)
-        vector = self.qwen_embedding.embedding(summary_text)
+        ocr_source = ocr_decision(text_layer)
+        record_cache("ocr_text_layer", ocr_source == "text_layer")
+        PAGES.labels(ocr_source).inc()
+        if ocr_source == "text_layer":
+            origin_text = text_layer["text"]
+        else:
+            tmp_img = tempfile.NamedTemporaryFile(suffix=".png", delete=False)
+            tmp_img.write(image_data)
+            tmp_img.close()
+            try:
+                origin_text = kimi_file_upload(tmp_img.name)
+            finally:
+                os.remove(tmp_img.name)
+        embedder = self.qdrant_manager.embedder() if self.qdrant_manager else self.qwen_embedding
+        # 旧集合（单一匿名向量）不存段落，省去段落向量化
+        named = self.qdrant_manager.active()["named"] if self.qdrant_manager else True
+        passage_texts = split_passages(origin_text) if named else []
+        vectors = embedder.embedding_batch([summary_text] + passage_texts)
+        vector = vectors[0]
         metadata = {
             "image_path": image_path,
             "summary_text": summary_text,
             "origin_text": origin_text,
             "image_index": image_index,
+            "filename": filename,
+            "ocr_source": ocr_source,
+            "embedding_model": embedder.model,
+            "passages": [
+                {"index": i, "text": text, "vector": v}
+                for i, (text, v) in enumerate(zip(passage_texts, vectors[1:]))
+            ],
         }
-        self.qdrant_manager.store_vectors(vector=vector, metadata=metadata)
+        if text_layer:
+            metadata["text_layer_chars"] = text_layer["chars"]
+            metadata["text_layer_quality"] = text_layer["quality"]
+            metadata["text_layer_image_ratio"] = text_layer["image_ratio"]
+        return vector, metadata
+
+    def process_single_image(
+        self,
+        image_data: bytes,
+        image_index: int,
+        doc_name: str,
+        filename: str,
+        text_layer: Dict[str, Any] = None,
+        vlm_image: bytes = None,
+        mime: str = None,
+        vector_id: str = None,
+    ) -> Dict[str, Any]:
+        """单页：摘要 → OCR → 向量化 → 写入 Qdrant"""
+        vector, metadata = self.analyze_page(
+            image_data, image_index, doc_name, filename, text_layer, vlm_image, mime
+        )
+        self.qdrant_manager.store_vectors(vector=vector, metadata=metadata, vector_id=vector_id)
         return metadata
 
-    def process_file_content(self, file_content: bytes, filename: str) -> dict:
-        """文档整体处理：转 PDF → 转图 → 多线程处理每页"""
-        doc_name = os.path.splitext(filename)[0]
+    def prepare_pages(self, file_content: bytes, filename: str) -> dict:
+        """文档拆页：转 PDF → 文本层 → 渲染 → 预处理，返回待处理页面与跳过记录"""
         pdf_content = self.convert_to_pdf(file_content, filename)
+        text_layers = self.extract_text_layers(pdf_content)
         images = self.pdf_to_images(pdf_content)
+        preprocessor = PagePreprocessor()
+        pages = []
+        skipped_pages = []
+        for i, img in enumerate(images):
+            prepared = preprocessor.prepare(img, text_layers[i])
+            if prepared["skip"]:
+                skipped_pages.append({"image_index": i, "reason": prepared["skip"]})
+                PAGES.labels(f"skipped_{prepared['skip']}").inc()
+                continue
+            pages.append({
+                "image_index": i,
+                "image": img,
+                "text_layer": text_layers[i],
+                "vlm_image": prepared["vlm_image"],
+                "mime": prepared["mime"],
+            })
+        preprocess_report = preprocessor.report()
+        print(f"[INFO] {filename} 预处理: {preprocess_report}")
+        return {"pages": pages, "skipped_pages": skipped_pages, "preprocess": preprocess_report}
+
+    def submit_page(self, fn, *args) -> Future:
+        """提交到页面线程池，并以完成回调维护待完成任务数（排队 + 执行中）"""
+        future = self.executor.submit(fn, *args)
+        QUEUE_DEPTH.labels("page_executor").inc()
+        future.add_done_callback(lambda _: QUEUE_DEPTH.labels("page_executor").dec())
+        return future
+
+    def process_file_content(self, file_content: bytes, filename: str) -> dict:
+        """文档整体处理：拆页 → 多线程处理每页"""
+        doc_name = os.path.splitext(filename)[0]
+        prepared = self.prepare_pages(file_content, filename)
         futures = [
-            self.executor.submit(
-                self.process_single_image, img, i, doc_name, filename
+            self.submit_page(
+                self.process_single_image, page["image"], page["image_index"], doc_name, filename,
+                page["text_layer"], page["vlm_image"], page["mime"],
             )
-            for i, img in enumerate(images)
+            for page in prepared["pages"]
         ]
         results = []
         for f in as_completed(futures):
@@ -203,6 +352,9 @@ class FileProcessor:
             "image_paths": [r["image_path"] for r in results],
             "summaries": [r["summary_text"] for r in results],
             "original_texts": [r["origin_text"] for r in results],
+            "ocr_sources": [r["ocr_source"] for r in results],
+            "skipped_pages": prepared["skipped_pages"],
+            "preprocess": prepared["preprocess"],
         }
 
     def process_image_file(self, image_content: bytes, filename: str) -> dict:
@@ -213,6 +365,7 @@ class FileProcessor:
             "image_paths": [r["image_path"]],
             "summaries": [r["summary_text"]],
             "original_texts": [r["origin_text"]],
+            "ocr_sources": [r["ocr_source"]],
         }
 
     def cleanup(self):
@@ -0,0 +1,121 @@
+"""
+页面图片预处理 - VLM 摘要前的空白/重复页检测、按内容密度缩小送 VLM 的副本并压缩编码
+OCR 与存储使用的 PNG 保持原渲染倍率，不受影响
+"""
+import io
+from typing import Any, Dict, List, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+from agentic_rag_test.agentic_rag.config import (
+    BLANK_INK_RATIO,
+    DUPLICATE_HASH_DISTANCE,
+    PAGE_MAX_ZOOM,
+    PAGE_MIN_ZOOM,
+    PAGE_RENDER_ZOOM,
+    VLM_IMAGE_FORMAT,
+    VLM_IMAGE_QUALITY,
+    VLM_MAX_LONG_EDGE,
+)
+
+MIME_TYPES = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}
+
+
+def vlm_scale(text_layer: Optional[Dict[str, Any]] = None) -> float:
+    """
+    根据内容密度选择送 VLM 副本相对渲染图的缩放比例（不超过 1）
+
+    Args:
+        text_layer: extract_text_layers 产出的单页指标，缺省按最高密度处理
+    """
+    if text_layer is None:
+        density = 1.0
+    else:
+        density = max(min(text_layer["chars"] / 2000, 1.0), text_layer["image_ratio"] * 0.5)
+    zoom = PAGE_MIN_ZOOM + (PAGE_MAX_ZOOM - PAGE_MIN_ZOOM) * density
+    return min(zoom / PAGE_RENDER_ZOOM, 1.0)
+
+
+def ink_ratio(img: Image.Image) -> float:
+    """非白像素占比（缩略图上统计）"""
+    gray = ImageOps.grayscale(img)
+    gray.thumbnail((256, 256))
+    hist = gray.histogram()
+    total = sum(hist) or 1
+    return sum(hist[:240]) / total
+
+
+def dhash(img: Image.Image, size: int = 16) -> int:
+    """差异哈希，用于近重复页判断"""
+    gray = ImageOps.grayscale(img).resize((size + 1, size))
+    pixels = list(gray.getdata())
+    bits = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            right = pixels[row * (size + 1) + col + 1]
+            bits = (bits << 1) | (left > right)
+    return bits
+
+
+def encode_for_vlm(img: Image.Image, scale: float = 1.0) -> Tuple[bytes, str]:
+    """按 scale 缩小副本、再限制长边上限，按配置格式编码，返回 (字节, MIME)"""
+    img = img.convert("RGB")
+    if scale < 1.0:
+        img = img.resize((max(round(img.width * scale), 1), max(round(img.height * scale), 1)), Image.LANCZOS)
+    if max(img.size) > VLM_MAX_LONG_EDGE:
+        img.thumbnail((VLM_MAX_LONG_EDGE, VLM_MAX_LONG_EDGE), Image.LANCZOS)
+    fmt = VLM_IMAGE_FORMAT.upper()
+    buf = io.BytesIO()
+    if fmt == "PNG":
+        img.save(buf, format="PNG", optimize=True)
+    else:
+        img.save(buf, format=fmt, quality=VLM_IMAGE_QUALITY)
+    return buf.getvalue(), MIME_TYPES.get(fmt, "image/jpeg")
+
+
+class PagePreprocessor:
+    """单个文档内的页面预处理：记录已见页哈希并统计节省量"""
+
+    def __init__(self):
+        self.seen: List[Tuple[int, str]] = []
+        self.stats = {
+            "pages": 0,
+            "skipped_blank": 0,
+            "skipped_duplicate": 0,
+            "source_bytes": 0,
+            "vlm_bytes": 0,
+        }
+
+    def prepare(self, image_data: bytes, text_layer: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        预处理单页
+
+        Returns:
+            Dict: {"skip": 原因或 None, "vlm_image": 编码后字节, "mime": MIME}
+        """
+        self.stats["pages"] += 1
+        self.stats["source_bytes"] += len(image_data)
+        img = Image.open(io.BytesIO(image_data))
+        has_text = bool(text_layer and text_layer["chars"])
+        if not has_text and ink_ratio(img) < BLANK_INK_RATIO:
+            self.stats["skipped_blank"] += 1
+            return {"skip": "blank"}
+        # 图像哈希相近且文本层一致才视为重复，避免同模板不同内容的页面被误判
+        h = dhash(img)
+        text = text_layer["text"] if text_layer else ""
+        for seen_hash, seen_text in self.seen:
+            if seen_text == text and bin(h ^ seen_hash).count("1") <= DUPLICATE_HASH_DISTANCE:
+                self.stats["skipped_duplicate"] += 1
+                return {"skip": "duplicate"}
+        self.seen.append((h, text))
+        vlm_image, mime = encode_for_vlm(img, vlm_scale(text_layer))
+        self.stats["vlm_bytes"] += len(vlm_image)
+        return {"skip": None, "vlm_image": vlm_image, "mime": mime}
+
+    def report(self) -> Dict[str, Any]:
+        """汇总节省情况"""
+        report = dict(self.stats)
+        source = report["source_bytes"] or 1
+        report["saved_ratio"] = round(1 - report["vlm_bytes"] / source, 4)
+        return report
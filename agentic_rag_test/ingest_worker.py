@@ -0,0 +1,163 @@
+"""
+分布式入库 worker - 从 PostgreSQL ingest_tasks 表领取任务并处理
+文件任务：转 PDF、渲染、预处理后拆分为页面任务；页面任务：摘要、OCR、向量化、写入 Qdrant
+多进程/多节点各启动一个即可水平扩展；租约 + 心跳保证崩溃 worker 的任务被重新领取
+
+用法：
+    python -m agentic_rag_test.agentic_rag.ingest_worker --concurrency 4
+"""
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from agentic_rag_test.agentic_rag.config import (
+    INGEST_HEARTBEAT_SECONDS,
+    INGEST_LEASE_SECONDS,
+    INGEST_MAX_ATTEMPTS,
+    INGEST_POLL_SECONDS,
+    INGEST_WORKER_CONCURRENCY,
+)
+from agentic_rag_test.agentic_rag.database.ingest_repository import (
+    claim_task,
+    complete_task,
+    fail_task,
+    heartbeat,
+    reap_expired,
+)
+from agentic_rag_test.agentic_rag.database.ingest_tables import ensure_ingest_tables
+from agentic_rag_test.agentic_rag.file_processor import FileProcessor
+from agentic_rag_test.agentic_rag.metrics import QUEUE_DEPTH
+from agentic_rag_test.agentic_rag.qdrant_manager import QDRANT_MANAGER
+
+
+def page_vector_id(job_id: int, filename: str, page_index: int) -> str:
+    """页面向量 ID 由 (批次, 文件, 页码) 确定，任务重试时覆盖而非重复写入"""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"ingest/{job_id}/{filename}/{page_index}"))
+
+
+class IngestWorker:
+    """单个 worker 进程：N 个并发槽位 + 后台心跳"""
+
+    def __init__(
+        self,
+        concurrency: int = INGEST_WORKER_CONCURRENCY,
+        lease_seconds: int = INGEST_LEASE_SECONDS,
+        heartbeat_seconds: int = INGEST_HEARTBEAT_SECONDS,
+        max_attempts: int = INGEST_MAX_ATTEMPTS,
+        poll_seconds: float = INGEST_POLL_SECONDS,
+    ):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.heartbeat_seconds = heartbeat_seconds
+        self.max_attempts = max_attempts
+        self.poll_seconds = poll_seconds
+        self.processor = FileProcessor(qdrant_manager=QDRANT_MANAGER())
+        self.held = set()
+        self.stopping = asyncio.Event()
+
+    def execute(self, task: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[List[Dict[str, Any]]]]:
+        """在线程中执行任务，返回 (结果, 追加的子任务)"""
+        filename = task["filename"]
+        if task["kind"] == "file":
+            prepared = self.processor.prepare_pages(task["data"], filename)
+            new_tasks = [
+                {
+                    "job_id": task["job_id"],
+                    "kind": "page",
+                    "filename": filename,
+                    "page_index": page["image_index"],
+                    "status": "pending",
+                    "data": page["image"],
+                    "params": {"text_layer": page["text_layer"]},
+                }
+                for page in prepared["pages"]
+            ]
+            result = {
+                "pages": len(new_tasks),
+                "skipped_pages": prepared["skipped_pages"],
+                "preprocess": prepared["preprocess"],
+            }
+            return result, new_tasks
+        if task["kind"] == "page":
+            page_index = task["page_index"] or 0
+            params = task["params"] or {}
+            metadata = self.processor.process_single_image(
+                task["data"],
+                page_index,
+                os.path.splitext(filename)[0],
+                filename,
+                params.get("text_layer"),
+                vector_id=page_vector_id(task["job_id"], filename, page_index),
+            )
+            return {"ocr_source": metadata["ocr_source"]}, None
+        raise ValueError(f"未知任务类型: {task['kind']}")
+
+    async def _slot(self):
+        while not self.stopping.is_set():
+            task = await claim_task(self.worker_id, self.lease_seconds, self.max_attempts)
+            if task is None:
+                try:
+                    await asyncio.wait_for(self.stopping.wait(), timeout=self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self.held.add(task["id"])
+            QUEUE_DEPTH.labels("ingest_worker_held").set(len(self.held))
+            try:
+                result, new_tasks = await asyncio.to_thread(self.execute, task)
+                if not await complete_task(task["id"], self.worker_id, result, new_tasks):
+                    print(f"[WARN] 任务 {task['id']} 租约已被接管，丢弃结果")
+            except Exception as e:
+                print(f"[WARN] 任务 {task['id']} ({task['filename']}#{task['page_index']}) 失败: {e}")
+                await fail_task(task["id"], self.worker_id, str(e), self.max_attempts)
+            finally:
+                self.held.discard(task["id"])
+                QUEUE_DEPTH.labels("ingest_worker_held").set(len(self.held))
+
+    async def _heartbeat(self):
+        while not self.stopping.is_set():
+            try:
+                await heartbeat(list(self.held), self.worker_id, self.lease_seconds)
+                reaped = await reap_expired(self.max_attempts)
+                if reaped:
+                    print(f"[WARN] {reaped} 个任务超过重试次数，已标记失败")
+            except Exception as e:
+                print(f"[WARN] 心跳失败: {e}")
+            try:
+                await asyncio.wait_for(self.stopping.wait(), timeout=self.heartbeat_seconds)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run(self):
+        await ensure_ingest_tables()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stopping.set)
+            except NotImplementedError:  # Windows
+                pass
+        print(f"[INFO] 入库 worker {self.worker_id} 启动，并发 {self.concurrency}")
+        heartbeat_task = asyncio.create_task(self._heartbeat())
+        await asyncio.gather(*(self._slot() for _ in range(self.concurrency)))
+        self.stopping.set()
+        await heartbeat_task
+        self.processor.cleanup()
+        print(f"[INFO] 入库 worker {self.worker_id} 已退出")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agentic RAG 分布式入库 worker")
+    parser.add_argument("--concurrency", type=int, default=INGEST_WORKER_CONCURRENCY)
+    parser.add_argument("--lease-seconds", type=int, default=INGEST_LEASE_SECONDS)
+    args = parser.parse_args()
+    worker = IngestWorker(concurrency=args.concurrency, lease_seconds=args.lease_seconds)
+    asyncio.run(worker.run())
+
+
+if __name__ == "__main__":
+    main()
@@ -5,6 +5,9 @@ import os
 import json
 from openai import OpenAI
 from dotenv import load_dotenv
+from langchain_core.callbacks import BaseCallbackHandler
+from agentic_rag_test.agentic_rag.admission import deadline_kwargs, remaining
+from agentic_rag_test.agentic_rag.metrics import cached_prompt_tokens, record_llm_usage, timed
 
 load_dotenv()
 
@@ -12,8 +15,11 @@ load_dotenv()
 class LLMClient:
     """统一封装多种大模型和 Embedding 服务"""
 
-    def __init__(self, provider: str, model: str = None):
+    EMBED_BATCH_LIMIT = 10  # 单次 embedding 请求文本数上限（DashScope 为 10）
+
+    def __init__(self, provider: str, model: str = None, dimensions: int = None):
         self.provider = provider
+        self.dimensions = dimensions  # embedding 输出维度（模型支持时生效，缺省使用模型默认维度）
         self.client, self.model = self._get_client_and_model(provider, model)
 
     def _get_client_and_model(self, provider: str, model: str = None):
@@ -21,7 +27,7 @@ class LLMClient:
             return (
                 OpenAI(
                     api_key=os.getenv("DASHSCOPE_API_KEY"),
-                    base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
+                    base_url=os.getenv("DASHSCOPE_BASE_URL", "https://dashscope.aliyuncs.com/compatible-mode/v1"),
                 ),
                 model or "qwen-plus",
             )
@@ -29,7 +35,7 @@ class LLMClient:
             return (
                 OpenAI(
                     api_key=os.getenv("DEEPSEEK_API_KEY"),
-                    base_url="https://api.deepseek.com",
+                    base_url=os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com"),
                 ),
                 model or "deepseek-chat",
             )
@@ -44,41 +50,109 @@ class LLMClient:
         else:
             raise ValueError(f"未知 provider: {provider}")
 
-    def chat(self, message: str) -> str:
+    def _client(self) -> OpenAI:
+        """本次调用使用的客户端：有请求时限时按剩余时间单次尝试，否则为默认客户端"""
+        options = deadline_kwargs()
+        return self.client.with_options(**options) if options else self.client
+
+    def chat(self, message: str, system_prompt: str = "You are a helpful assistant.") -> str:
         """非流式对话，返回完整回复"""
-        resp = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant."},
-                {"role": "user", "content": message},
-            ],
-            stream=False,
-        )
+        return self.chat_messages([
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": message},
+        ])
+
+    def chat_messages(self, messages: list) -> str:
+        """非流式对话（完整消息列表）；固定内容放在前面可命中服务端前缀缓存"""
+        with timed("llm_generate"):
+            resp = self._client().chat.completions.create(
+                model=self.model,
+                messages=messages,
+                stream=False,
+            )
+        record_llm_usage(self.provider, self.model, resp.usage)
         return resp.choices[0].message.content
 
-    def qwen_vision(self, image_data: str, prompt: str) -> str:
-        """多模态调用 - 图片 + 文本，用于摘要生成"""
-        response = self.client.chat.completions.create(
-            model=self.model,
-            messages=[
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": prompt},
-                        {
-                            "type": "image_url",
-                            "image_url": {"url": f"data:image/png;base64,{image_data}"},
-                        },
-                    ],
-                }
-            ],
-        )
+    def qwen_vision(self, image_data: str, prompt: str, mime: str = "image/png") -> str:
+        """多模态调用 - 图片（base64）+ 文本，用于摘要生成"""
+        with timed("summary"):
+            response = self._client().chat.completions.create(
+                model=self.model,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": [
+                            {"type": "text", "text": prompt},
+                            {
+                                "type": "image_url",
+                                "image_url": {"url": f"data:{mime};base64,{image_data}"},
+                            },
+                        ],
+                    }
+                ],
+            )
+        record_llm_usage(self.provider, self.model, response.usage)
         return response.choices[0].message.content
 
+    def _embedding_kwargs(self) -> dict:
+        return {"dimensions": self.dimensions} if self.dimensions else {}
+
     def embedding(self, message) -> list:
-        """文本向量化，返回 1024 维向量（Qwen embedding）"""
-        completion = self.client.embeddings.create(
-            model=self.model,
-            input=message,
-        )
+        """文本向量化，返回单条向量（维度由模型与 dimensions 决定）"""
+        with timed("embed"):
+            completion = self._client().embeddings.create(
+                model=self.model,
+                input=message,
+                **self._embedding_kwargs(),
+            )
+        record_llm_usage(self.provider, self.model, completion.usage)
         return json.loads(completion.model_dump_json())["data"][0]["embedding"]
+
+    def embedding_batch(self, messages: list) -> list:
+        """批量向量化，按输入顺序返回向量列表（超过单次上限时分批请求）"""
+        vectors = []
+        for i in range(0, len(messages), self.EMBED_BATCH_LIMIT):
+            with timed("embed"):
+                completion = self._client().embeddings.create(
+                    model=self.model,
+                    input=messages[i:i + self.EMBED_BATCH_LIMIT],
+                    **self._embedding_kwargs(),
+                    )
+            record_llm_usage(self.provider, self.model, completion.usage)
+            vectors.extend(d.embedding for d in sorted(completion.data, key=lambda d: d.index))
+        return vectors
+
+
+class UsageCallback(BaseCallbackHandler):
+    """LangChain 模型（Agent 所用 ChatDeepSeek）的 token 用量：写入指标并累计本次运行的前缀缓存命中"""
+
+    def __init__(self, provider: str, model: str):
+        self.provider = provider
+        self.model = model
+        self.totals = {"calls": 0, "prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+
+    def on_llm_end(self, response, **kwargs) -> None:
+        usage = (response.llm_output or {}).get("token_usage")
+        if not usage:
+            return
+        record_llm_usage(self.provider, self.model, usage)
+        self.totals["calls"] += 1
+        self.totals["prompt_tokens"] += usage.get("prompt_tokens") or 0
+        self.totals["cached_tokens"] += cached_prompt_tokens(usage)
+        self.totals["completion_tokens"] += usage.get("completion_tokens") or 0
+
+    def report(self) -> dict:
+        prompt = self.totals["prompt_tokens"]
+        return {**self.totals, "cache_hit_ratio": round(self.totals["cached_tokens"] / prompt, 4) if prompt else 0.0}
+
+
+class DeadlineCallback(BaseCallbackHandler):
+    """请求时限已到时阻止 Agent 发起新一轮模型调用（抛出 DeadlineExceeded 而非被回调管理器吞掉）"""
+
+    raise_error = True
+
+    def on_chat_model_start(self, serialized, messages, **kwargs) -> None:
+        remaining()
+
+    def on_llm_start(self, serialized, prompts, **kwargs) -> None:
+        remaining()
@@ -0,0 +1,107 @@
+"""
+运行指标 - Prometheus 直方图/计数器/仪表盘 + 可选 OpenTelemetry trace span
+各模块通过 timed() 记录阶段耗时，通过 record_llm_usage() 记录 token 用量，/metrics 暴露给 Prometheus
+"""
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+from agentic_rag_test.agentic_rag.config import TRACING_ENABLED
+
+try:
+    from opentelemetry import trace as _otel_trace
+except ImportError:  # 未安装 opentelemetry 时 span 为空操作
+    _otel_trace = None
+
+_LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# 阶段：convert / text_layer / render / summary / ocr / embed / upsert / search / text_fetch / llm_generate
+STAGE_LATENCY = Histogram(
+    "rag_stage_latency_seconds", "各处理阶段耗时", ["stage"], buckets=_LATENCY_BUCKETS
+)
+STAGE_ERRORS = Counter("rag_stage_errors_total", "各处理阶段异常次数", ["stage"])
+HTTP_LATENCY = Histogram(
+    "rag_http_request_latency_seconds", "HTTP 接口耗时", ["path", "status"], buckets=_LATENCY_BUCKETS
+)
+HTTP_IN_FLIGHT = Gauge("rag_http_in_flight_requests", "处理中的 HTTP 请求数", ["path"])
+LLM_TOKENS = Counter(
+    "rag_llm_tokens_total", "大模型 token 用量", ["provider", "model", "kind"]
+)  # kind: prompt / completion / cached（prompt 中命中前缀缓存的部分）
+CACHE_EVENTS = Counter("rag_cache_events_total", "缓存命中/未命中次数", ["cache", "result"])
+PAGES = Counter("rag_ingested_pages_total", "入库页面数（按文本来源/跳过原因）", ["outcome"])
+QUEUE_DEPTH = Gauge("rag_queue_depth", "队列深度", ["queue"])
+CONTEXT_TOKENS_SAVED = Counter(
+    "rag_agent_context_tokens_saved_total", "Agent 检索备忘对重复命中省去的估算 token 数（未扣除 expand_chunk 展开）"
+)
+ADMISSION_REJECTED = Counter(
+    "rag_admission_rejected_total", "准入控制拒绝次数", ["endpoint", "status"]
+)  # status: 429 排队已满 / 503 排队超时或请求超时
+
+_tracer = _otel_trace.get_tracer("agentic_rag") if (_otel_trace and TRACING_ENABLED) else None
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """可选 trace span：启用 TRACING_ENABLED 且安装 opentelemetry 时生效"""
+    if _tracer is None:
+        yield None
+        return
+    with _tracer.start_as_current_span(name) as s:
+        for key, value in attributes.items():
+            s.set_attribute(key, value)
+        yield s
+
+
+@contextmanager
+def timed(stage: str):
+    """记录阶段耗时（异常同样计入耗时并累计错误数）"""
+    start = time.perf_counter()
+    with span(stage):
+        try:
+            yield
+        except Exception:
+            STAGE_ERRORS.labels(stage).inc()
+            raise
+        finally:
+            STAGE_LATENCY.labels(stage).observe(time.perf_counter() - start)
+
+
+def _usage_field(usage, name: str):
+    return usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+
+
+def cached_prompt_tokens(usage) -> int:
+    """
+    命中服务端前缀缓存的输入 token：
+    DeepSeek 为 prompt_cache_hit_tokens，OpenAI / DashScope 为 prompt_tokens_details.cached_tokens
+    """
+    hit = _usage_field(usage, "prompt_cache_hit_tokens")
+    if hit is None:
+        details = _usage_field(usage, "prompt_tokens_details")
+        hit = _usage_field(details, "cached_tokens") if details else None
+    return hit or 0
+
+
+def record_llm_usage(provider: str, model: str, usage) -> None:
+    """从 OpenAI 兼容响应的 usage 字段（对象或 dict）累计 token"""
+    if usage is None:
+        return
+    prompt = _usage_field(usage, "prompt_tokens") or 0
+    completion = _usage_field(usage, "completion_tokens") or 0
+    cached = cached_prompt_tokens(usage)
+    if prompt:
+        LLM_TOKENS.labels(provider, model, "prompt").inc(prompt)
+    if completion:
+        LLM_TOKENS.labels(provider, model, "completion").inc(completion)
+    if cached:
+        LLM_TOKENS.labels(provider, model, "cached").inc(cached)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_EVENTS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def render_latest():
+    """返回 (Prometheus 文本, Content-Type)"""
+    return generate_latest(), CONTENT_TYPE_LATEST
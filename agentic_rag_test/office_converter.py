@@ -0,0 +1,207 @@
+"""
+Office 文档转换 - 常驻无头 LibreOffice（UNO）进程池
+DOC/DOCX/PPT/PPTX → PDF，避免每个文件冷启动 soffice；支持并发、单任务超时、崩溃后回收重启
+"""
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from pathlib import Path
+from typing import Optional
+
+from agentic_rag_test.agentic_rag.metrics import QUEUE_DEPTH
+from agentic_rag_test.agentic_rag.config import (
+    LIBREOFFICE_POOL_SIZE,
+    LIBREOFFICE_TIMEOUT,
+    SOFFICE_PATH,
+)
+
+# 扩展名 → LibreOffice PDF 导出过滤器
+PDF_FILTERS = {
+    ".doc": "writer_pdf_Export",
+    ".docx": "writer_pdf_Export",
+    ".ppt": "impress_pdf_Export",
+    ".pptx": "impress_pdf_Export",
+}
+
+
+def _prop(name: str, value):
+    from com.sun.star.beans import PropertyValue
+
+    p = PropertyValue()
+    p.Name = name
+    p.Value = value
+    return p
+
+
+class LibreOfficeWorker:
+    """单个常驻 soffice 进程，独立 UNO 管道与用户配置目录"""
+
+    def __init__(self, index: int):
+        self.index = index
+        # 管道名含 pid：多个 uvicorn worker / ingest_worker / bulk_load 各自的 soffice 互不冲突，也无需占用端口
+        self.pipe_name = f"agentic_rag_lo_{os.getpid()}_{index}"
+        self.profile_dir = Path(tempfile.gettempdir()) / f"lo_profile_{os.getpid()}_{index}"
+        self.process: Optional[subprocess.Popen] = None
+        self.desktop = None
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.jobs = 0
+
+    def start(self, wait: float = 30.0):
+        """启动 soffice 并等待 UNO 管道就绪"""
+        import uno
+
+        self.process = subprocess.Popen(
+            [
+                SOFFICE_PATH,
+                "--headless",
+                "--invisible",
+                "--nologo",
+                "--norestore",
+                "--nodefault",
+                f"-env:UserInstallation={self.profile_dir.as_uri()}",
+                f"--accept=pipe,name={self.pipe_name};urp;StarOffice.ComponentContext",
+            ],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        local_ctx = uno.getComponentContext()
+        resolver = local_ctx.ServiceManager.createInstanceWithContext(
+            "com.sun.star.bridge.UnoUrlResolver", local_ctx
+        )
+        deadline = time.monotonic() + wait
+        while True:
+            try:
+                ctx = resolver.resolve(
+                    f"uno:pipe,name={self.pipe_name};urp;StarOffice.ComponentContext"
+                )
+                self.desktop = ctx.ServiceManager.createInstanceWithContext(
+                    "com.sun.star.frame.Desktop", ctx
+                )
+                return
+            except Exception:
+                if self.process.poll() is not None or time.monotonic() > deadline:
+                    self.stop()
+                    raise RuntimeError(f"LibreOffice 进程启动失败（管道 {self.pipe_name}）")
+                time.sleep(0.5)
+
+    def stop(self):
+        """结束 soffice 进程（挂起中的 UNO 调用随之抛错退出）"""
+        self.desktop = None
+        if self.process is not None and self.process.poll() is None:
+            self.process.kill()
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                pass
+        self.process = None
+
+    def restart(self):
+        """崩溃或超时后回收：杀进程、换新线程、重新拉起"""
+        print(f"[WARN] 回收 LibreOffice worker {self.index}")
+        self.stop()
+        self.executor.shutdown(wait=False)
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        shutil.rmtree(self.profile_dir, ignore_errors=True)
+        self.start()
+
+    def healthy(self) -> bool:
+        return self.process is not None and self.process.poll() is None and self.desktop is not None
+
+    def _convert(self, in_path: str, out_path: str, filter_name: str):
+        import uno
+
+        doc = self.desktop.loadComponentFromURL(
+            uno.systemPathToFileUrl(in_path), "_blank", 0, (_prop("Hidden", True),)
+        )
+        if doc is None:
+            raise RuntimeError("LibreOffice 无法打开文档")
+        try:
+            doc.storeToURL(
+                uno.systemPathToFileUrl(out_path), (_prop("FilterName", filter_name),)
+            )
+        finally:
+            doc.close(True)
+
+    def convert(self, in_path: str, out_path: str, filter_name: str, timeout: float):
+        future = self.executor.submit(self._convert, in_path, out_path, filter_name)
+        try:
+            future.result(timeout=timeout)
+            self.jobs += 1
+        except FutureTimeout:
+            self.restart()
+            raise TimeoutError(f"LibreOffice 转换超时（{timeout}s）")
+        except Exception:
+            if not self.healthy():
+                self.restart()
+            raise
+
+
+class LibreOfficePool:
+    """LibreOffice 进程池：预热 N 个 worker，按需借还"""
+
+    def __init__(self, size: int = LIBREOFFICE_POOL_SIZE, timeout: float = LIBREOFFICE_TIMEOUT):
+        self.timeout = timeout
+        self.workers = queue.Queue()
+        self._all = []
+        for i in range(size):
+            worker = LibreOfficeWorker(i)
+            worker.start()
+            self._all.append(worker)
+            self.workers.put(worker)
+
+    def convert_to_pdf(self, file_content: bytes, ext: str) -> bytes:
+        """
+        将 Office 文档字节转换为 PDF 字节
+
+        Args:
+            file_content: 原始文件内容
+            ext: 扩展名（.doc/.docx/.ppt/.pptx）
+
+        Returns:
+            bytes: PDF 内容
+        """
+        filter_name = PDF_FILTERS.get(ext)
+        if filter_name is None:
+            raise ValueError(f"不支持格式: {ext}")
+        try:
+            worker = self.workers.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError("等待 LibreOffice worker 超时")
+        QUEUE_DEPTH.labels("libreoffice_idle_workers").set(self.workers.qsize())
+        work_dir = tempfile.mkdtemp(prefix="lo_job_")
+        try:
+            in_path = os.path.join(work_dir, f"input{ext}")
+            out_path = os.path.join(work_dir, "output.pdf")
+            Path(in_path).write_bytes(file_content)
+            if not worker.healthy():
+                worker.restart()
+            worker.convert(in_path, out_path, filter_name, self.timeout)
+            return Path(out_path).read_bytes()
+        finally:
+            self.workers.put(worker)
+            QUEUE_DEPTH.labels("libreoffice_idle_workers").set(self.workers.qsize())
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def shutdown(self):
+        for worker in self._all:
+            worker.stop()
+            worker.executor.shutdown(wait=False)
+            shutil.rmtree(worker.profile_dir, ignore_errors=True)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_office_pool() -> LibreOfficePool:
+    """获取进程内共享的 LibreOffice 进程池（首次调用时预热）"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = LibreOfficePool()
+        return _pool
@@ -0,0 +1,63 @@
+"""
+OCR 段落切分 - 把页面 origin_text 切成带重叠的短段落，作为第二个命名向量（passage）入库
+段落点与页面点同在一个集合，payload.parent_id 指向所属页面；检索可直接命中段落，只返回匹配段落 + 页面摘要
+"""
+import re
+import uuid
+from typing import Any, Dict, List
+
+from agentic_rag_test.agentic_rag.config import PASSAGE_CHARS, PASSAGE_MIN_CHARS, PASSAGE_OVERLAP
+
+# 命名向量：页面摘要 / OCR 段落
+SUMMARY_VECTOR = "summary"
+PASSAGE_VECTOR = "passage"
+
+# 在句末标点或换行后断句，标点保留在前一句
+_SENTENCE_END = re.compile(r"(?<=[。！？!?；;\n])")
+
+
+def split_passages(
+    text: str,
+    size: int = PASSAGE_CHARS,
+    overlap: int = PASSAGE_OVERLAP,
+    min_chars: int = PASSAGE_MIN_CHARS,
+) -> List[str]:
+    """按句子累积到约 size 字切段，相邻段落重叠 overlap 字；超长句按字数硬切"""
+    sentences = []
+    for s in _SENTENCE_END.split(text or ""):
+        s = s.strip()
+        while len(s) > size:
+            sentences.append(s[:size])
+            s = s[size - overlap:]
+        if s:
+            sentences.append(s)
+
+    passages = []
+    current = ""
+    for s in sentences:
+        if current and len(current) + len(s) > size:
+            passages.append(current)
+            current = current[-overlap:] if overlap and overlap + len(s) <= size else ""
+        current += s
+    if current and (len(current) >= min_chars or not passages):
+        passages.append(current)
+    return [p for p in passages if len(p) >= min_chars]
+
+
+def passage_id(parent_id: str, index: int) -> str:
+    """段落 ID 由 (页面 ID, 序号) 确定，页面重写时覆盖而非重复"""
+    return str(uuid.uuid5(uuid.NAMESPACE_URL, f"passage/{parent_id}/{index}"))
+
+
+def passage_metadata(parent: Dict[str, Any], index: int, text: str, parent_id: str) -> Dict[str, Any]:
+    """段落点 payload：段落文本 + 所属页面的定位字段"""
+    return {
+        "kind": "passage",
+        "parent_id": parent_id,
+        "passage_index": index,
+        "passage_text": text,
+        "image_path": parent.get("image_path", ""),
+        "image_index": parent.get("image_index"),
+        "filename": parent.get("filename", ""),
+        "embedding_model": parent.get("embedding_model"),
+    }
@@ -47,6 +47,8 @@ SYSTEM_PROMPT = '''
 - 每个用户问题，最多调用 RAG 工具 5 次
 - 只有在"信息明显不足且仍属于 A 类问题"时，才允许第 2 次调用
 - RAG 工具返回的内容为【最高可信信息源】，回答必须以其为依据，不得编造
+- 检索结果带引用编号 [R1]、[R2]…；本次任务中已返回过的页面只给出编号，不再重复全文，请直接引用前文对应内容
+- 仅当需要重新核对某页原文且前文已无法直接引用时，才调用 `expand_chunk` 按编号取回全文
 
 ────────────────
 四、回答生成规则
@@ -0,0 +1,25 @@
+"""
+Base RAG 提示词 - 按「固定系统提示 → 排序后的检索内容 → 用户问题」组织，变化最多的部分放在最后
+DeepSeek / DashScope 的上下文缓存按请求前缀命中：系统提示对所有请求相同，检索到同一批页面的问题共享更长前缀
+"""
+from typing import Dict, List
+
+BASE_RAG_SYSTEM_PROMPT = '''
+你是一个【商业研究报告问答助手】，只依据用户消息中「检索内容」部分给出的研究报告资料回答问题。
+
+回答规则：
+1. 事实优先：先陈述资料中的结论、观点或数据，再做归纳整合，不得编造资料中没有的信息
+2. 明确来源：引用时注明来源文件或页面，便于复核
+3. 不确定性处理：资料不足以支撑结论时，明确说明"资料未明确给出 / 信息不足"
+4. 表达风格：商业研究/咨询报告风格，精简、专业、中立，仅输出答案本身
+
+检索内容中每个页面以「来源文件」（页面图片路径）开头，「切片内容」为该页正文；有匹配段落时只给出页面摘要与匹配段落，否则为整页文本。
+'''
+
+
+def build_base_rag_messages(message: str, search_data: str) -> List[Dict[str, str]]:
+    """检索内容在前、问题在后，保证不同问题检索到相同页面时请求前缀一致"""
+    return [
+        {"role": "system", "content": BASE_RAG_SYSTEM_PROMPT},
+        {"role": "user", "content": f"检索内容：\n{search_data}\n用户问题：{message}"},
+    ]
@@ -1,74 +1,390 @@
 """
 Qdrant 向量数据库管理 - 向量存储与相似度检索
 """
+import threading
+import time
 import uuid
+from collections import defaultdict
+from datetime import datetime
 from typing import List, Dict, Any, Optional
 
-from qdrant_client import QdrantClient
+from qdrant_client import QdrantClient, models
 from qdrant_client.grpc import ScoredPoint
-from qdrant_client.models import Distance, VectorParams
-from qdrant_client.models import PointStruct, PointIdsList
-
-from agentic_rag_test.agentic_rag.config import QDRANT_URL, QDRANT_COLLECTION
+from qdrant_client.models import Distance, VectorParams, OptimizersConfigDiff, HnswConfigDiff
+from qdrant_client.models import PointStruct, PointIdsList, FilterSelector, PayloadSchemaType
+from qdrant_client.models import FieldCondition, Filter, MatchAny, QueryRequest
+from qdrant_client.models import CreateAlias, CreateAliasOperation, DeleteAlias, DeleteAliasOperation
+
+from agentic_rag_test.agentic_rag.admission import DeadlineExceeded, qdrant_timeout
+from agentic_rag_test.agentic_rag.config import (
+    EMBEDDING_DIM,
+    EMBEDDING_MODEL,
+    QDRANT_COLLECTION,
+    QDRANT_HNSW_EF_CONSTRUCT,
+    QDRANT_HNSW_M,
+    QDRANT_PATH,
+    QDRANT_SLIM_PAYLOAD,
+    QDRANT_URL,
+    PASSAGE_SEARCH_LIMIT,
+    PASSAGES_PER_PAGE,
+)
 from agentic_rag_test.agentic_rag.llm_factory import LLMClient
+from agentic_rag_test.agentic_rag.metrics import timed
+from agentic_rag_test.agentic_rag.passages import (
+    PASSAGE_VECTOR,
+    SUMMARY_VECTOR,
+    passage_id,
+    passage_metadata,
+    split_passages,
+)
+from agentic_rag_test.agentic_rag.text_store import TEXT_FIELDS, get_text_store
+
+# 精简模式下检索只投影这些小字段
+SLIM_PAYLOAD_FIELDS = [
+    "image_path", "image_index", "filename", "page", "ocr_source", "embedding_model",
+    "kind", "parent_id", "passage_index",
+]
+
+# 物理集合名编码 embedding 配置：{别名}__{模型}__{维度}__{时间戳}，各进程据此选择与集合匹配的模型
+ALIAS_REFRESH_SECONDS = 5
+
+
+def physical_collection_name(alias: str, model: str, dim: int) -> str:
+    return f"{alias}__{model}__{dim}__{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+
+
+def parse_collection_spec(name: str) -> Optional[Dict[str, Any]]:
+    """从物理集合名解析 embedding 模型与维度，旧命名返回 None"""
+    parts = name.rsplit("__", 3)
+    if len(parts) == 4 and parts[2].isdigit():
+        return {"model": parts[1], "dim": int(parts[2])}
+    return None
+
+
+# 重建期间的双写目标：{别名: {"collection": 新集合, "embedder": 新模型 LLMClient}}
+_dual_write_targets: Dict[str, Dict[str, Any]] = {}
+_dual_write_lock = threading.Lock()
+
+
+def register_dual_write(alias: str, collection: str, embedder: LLMClient) -> None:
+    """重建开始：本进程内写入别名的数据同时用新模型写入新集合"""
+    with _dual_write_lock:
+        _dual_write_targets[alias] = {"collection": collection, "embedder": embedder}
+
+
+def unregister_dual_write(alias: str) -> None:
+    with _dual_write_lock:
+        _dual_write_targets.pop(alias, None)
+
+
+def passages_of(parent_ids: List[str]) -> Filter:
+    """所属页面为 parent_ids 的段落点"""
+    return Filter(must=[FieldCondition(key="parent_id", match=MatchAny(any=[str(i) for i in parent_ids]))])
 
 
 class QDRANT_MANAGER:
-    def __init__(self):
+    def __init__(self, slim_payload: bool = QDRANT_SLIM_PAYLOAD):
         """初始化 Qdrant 客户端"""
-        self.client = QdrantClient(url=QDRANT_URL)
+        if QDRANT_PATH == ":memory:":
+            self.client = QdrantClient(location=":memory:")
+        elif QDRANT_PATH:
+            self.client = QdrantClient(path=QDRANT_PATH)
+        else:
+            self.client = QdrantClient(url=QDRANT_URL)
         self.collection_name = QDRANT_COLLECTION
+        self.slim_payload = slim_payload
+        self.text_store = get_text_store() if slim_payload else None
+        self._active = None
+        self._active_at = 0.0
+        self._embedders: Dict[tuple, LLMClient] = {}
+        self._named: Dict[str, bool] = {}
         self._init_collection()
 
+    def active(self) -> Dict[str, Any]:
+        """
+        当前别名指向的物理集合及与之匹配的 embedding 客户端（缓存 ALIAS_REFRESH_SECONDS 秒）
+
+        Returns:
+            Dict: {"collection", "model", "dim", "named", "embedder"}
+        """
+        now = time.monotonic()
+        if self._active is None or now - self._active_at > ALIAS_REFRESH_SECONDS:
+            physical = self.resolve_collection()
+            spec = parse_collection_spec(physical) or {"model": EMBEDDING_MODEL, "dim": EMBEDDING_DIM}
+            key = (spec["model"], spec["dim"])
+            if key not in self._embedders:
+                self._embedders[key] = LLMClient(provider="qwen-cn", model=spec["model"], dimensions=spec["dim"])
+            self._active = {
+                "collection": physical,
+                **spec,
+                "named": self.is_named(physical),
+                "embedder": self._embedders[key],
+            }
+            self._active_at = now
+        return self._active
+
+    def embedder(self) -> LLMClient:
+        """与当前集合匹配的 embedding 客户端"""
+        return self.active()["embedder"]
+
+    def is_named(self, collection: str) -> bool:
+        """集合是否使用命名向量（summary + passage）；旧集合为单一匿名向量，不写入段落"""
+        if collection not in self._named:
+            vectors = self.client.get_collection(collection).config.params.vectors
+            self._named[collection] = isinstance(vectors, dict)
+        return self._named[collection]
+
+    def build_points(self,
+                     ids: List[str],
+                     vectors: List[List[float]],
+                     metadatas: List[Dict[str, Any]],
+                     texts: Dict[str, Dict[str, str]],
+                     named: bool) -> List[PointStruct]:
+        """构造页面点及其段落点（metadata["passages"] 为 [{"index", "text", "vector"}]），精简模式下大文本写入 texts"""
+        points = []
+        for vid, vector, metadata in zip(ids, vectors, metadatas):
+            metadata = dict(metadata)
+            passages = metadata.pop("passages", None) or []
+            if metadata.get("kind") == "passage":
+                if named:  # 旧集合没有 passage 向量，段落点直接丢弃
+                    points.append(PointStruct(
+                        id=vid,
+                        vector={PASSAGE_VECTOR: vector},
+                        payload=self._split_passage_payload(vid, metadata, texts),
+                    ))
+                continue
+            metadata.setdefault("kind", "page")
+            points.append(PointStruct(
+                id=vid,
+                vector={SUMMARY_VECTOR: vector} if named else vector,
+                payload=self._split_payload(vid, metadata, texts),
+            ))
+            if not named:
+                continue
+            for passage in passages:
+                pid = passage_id(vid, passage["index"])
+                points.append(PointStruct(
+                    id=pid,
+                    vector={PASSAGE_VECTOR: passage["vector"]},
+                    payload=self._split_passage_payload(
+                        pid, passage_metadata(metadata, passage["index"], passage["text"], vid), texts
+                    ),
+                ))
+        return points
+
+    def _split_payload(self, vector_id: str, metadata: Dict[str, Any], texts: Dict[str, Dict[str, str]]) -> Dict[str, Any]:
+        """精简模式：把大文本剥离到 texts，返回只含小字段的 payload"""
+        if not self.slim_payload:
+            return metadata
+        texts[vector_id] = {k: metadata.get(k, "") for k in TEXT_FIELDS}
+        return {k: v for k, v in metadata.items() if k not in TEXT_FIELDS}
+
+    def _split_passage_payload(self, pid: str, payload: Dict[str, Any], texts: Dict[str, Dict[str, str]]) -> Dict[str, Any]:
+        """精简模式：段落文本同样剥离到 texts（以段落 ID 为键存入 origin_text）"""
+        if not self.slim_payload:
+            return payload
+        payload = dict(payload)
+        texts[pid] = {"origin_text": payload.pop("passage_text", ""), "summary_text": ""}
+        return payload
+
+    def _passage_ids(self, collection: str, parent_ids: List[str]) -> List[str]:
+        """列出 parent_ids 名下的段落点 ID"""
+        ids, offset = [], None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=collection,
+                scroll_filter=passages_of(parent_ids),
+                limit=256,
+                offset=offset,
+                with_payload=False,
+                with_vectors=False,
+            )
+            ids += [str(p.id) for p in points]
+            if offset is None:
+                return ids
+
+    def drop_passages(self, collection: str, parent_ids: List[str]) -> None:
+        """删除 parent_ids 名下的段落点（精简模式下连同侧存储中的段落文本）"""
+        if self.slim_payload:
+            self.text_store.delete_many(self._passage_ids(collection, parent_ids))
+        self.client.delete(collection_name=collection, points_selector=FilterSelector(filter=passages_of(parent_ids)))
+
+    def fetch_texts(self, points: List[ScoredPoint]) -> Dict[str, Dict[str, str]]:
+        """
+        为最终入选的命中批量取回文本
+
+        Args:
+            points: 检索（并经过筛选）后保留的命中
+
+        Returns:
+            Dict[str, Dict]: {向量ID: {"origin_text", "summary_text"}}
+        """
+        if not self.slim_payload:
+            return {
+                str(p.id): {k: (p.payload or {}).get(k, "") for k in TEXT_FIELDS}
+                for p in points
+            }
+        try:
+            with timed("text_fetch"):
+                texts = self.text_store.get_many([str(p.id) for p in points])
+                missing = [p for p in points if str(p.id) not in texts]
+                if missing:
+                    texts.update(self._payload_texts(missing, list(TEXT_FIELDS)))
+                return texts
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            raise Exception(f"获取文本失败: {str(e)}")
+
+    def _payload_texts(self, points: List[ScoredPoint], fields: List[str],
+                       collection: Optional[str] = None) -> Dict[str, Dict[str, str]]:
+        """
+        侧存储中没有的点回退到 Qdrant payload：开启精简模式前写入的点文本仍在 payload 中
+        命中本身带有这些字段时直接使用，否则按 ID 补取
+        """
+        texts, to_fetch = {}, []
+        for p in points:
+            payload = p.payload or {}
+            if any(k in payload for k in fields):
+                texts[str(p.id)] = {k: payload.get(k, "") for k in fields}
+            else:
+                to_fetch.append(p.id)
+        if to_fetch:
+            for record in self.client.retrieve(collection or self.collection_name, ids=to_fetch, with_payload=fields):
+                payload = record.payload or {}
+                texts[str(record.id)] = {k: payload.get(k, "") for k in fields}
+        return texts
+
     def _init_collection(self):
-        """初始化集合，如果不存在则创建"""
+        """初始化集合：QDRANT_COLLECTION 作为别名指向带时间戳的物理集合，不存在则创建"""
         try:
-            # 检查集合是否存在
             collections = self.client.get_collections().collections
             exists = any(collection.name == self.collection_name for collection in collections)
+            aliased = any(
+                alias.alias_name == self.collection_name
+                for alias in self.client.get_aliases().aliases
+            )
 
-            if not exists:
-                # 创建新的集合
-                self.client.create_collection(
-                    collection_name=self.collection_name,
-                    vectors_config=VectorParams(
-                        size=1024,  # Qwen embedding 维度
-                        distance=Distance.COSINE
-                    )
-                )
-                print(f"创建新的集合: {self.collection_name}")
+            if not exists and not aliased:
+                physical = physical_collection_name(self.collection_name, EMBEDDING_MODEL, EMBEDDING_DIM)
+                self.create_physical_collection(physical, EMBEDDING_DIM)
+                self.swap_alias(physical)
+                print(f"创建新的集合: {physical}（别名 {self.collection_name}）")
         except Exception as e:
             raise Exception(f"初始化 Qdrant 集合失败: {str(e)}")
 
-    def store_vectors(self, vector: List[float], metadata: Dict[str, Any]) -> str:
+    def create_physical_collection(self,
+                                   name: str,
+                                   dim: int,
+                                   hnsw_m: int = QDRANT_HNSW_M,
+                                   ef_construct: int = QDRANT_HNSW_EF_CONSTRUCT) -> None:
+        """按指定维度与 HNSW 参数创建物理集合：summary（页面摘要）与 passage（OCR 段落）两个命名向量"""
+        self.client.create_collection(
+            collection_name=name,
+            vectors_config={
+                SUMMARY_VECTOR: VectorParams(size=dim, distance=Distance.COSINE),
+                PASSAGE_VECTOR: VectorParams(size=dim, distance=Distance.COSINE),
+            },
+            hnsw_config=HnswConfigDiff(m=hnsw_m, ef_construct=ef_construct),
+        )
+        # 段落按所属页面过滤、按类型区分
+        for field in ("parent_id", "kind"):
+            self.client.create_payload_index(name, field_name=field, field_schema=PayloadSchemaType.KEYWORD)
+        self._named[name] = True
+
+    def resolve_collection(self) -> str:
+        """别名 → 当前物理集合名；旧部署（直接使用集合名）原样返回"""
+        for alias in self.client.get_aliases().aliases:
+            if alias.alias_name == self.collection_name:
+                return alias.collection_name
+        return self.collection_name
+
+    def swap_alias(self, target: str) -> None:
+        """原子切换别名到 target（删除旧指向与创建新指向在同一请求中完成）"""
+        operations = []
+        if any(a.alias_name == self.collection_name for a in self.client.get_aliases().aliases):
+            operations.append(DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=self.collection_name)))
+        operations.append(CreateAliasOperation(
+            create_alias=CreateAlias(collection_name=target, alias_name=self.collection_name)
+        ))
+        self.client.update_collection_aliases(change_aliases_operations=operations)
+
+    def _dual_write(self, ids: List[str], metadatas: List[Dict[str, Any]], replace: bool = False) -> None:
+        """
+        重建期间同步写入新集合（失败不影响主写入，重建任务的追平阶段会补齐）
+        按新集合的向量结构重新构造：源为旧单向量集合时上游未切分段落，在此由 origin_text 切分
+        """
+        target = _dual_write_targets.get(self.collection_name)
+        if target is None:
+            return
+        try:
+            embedder = target["embedder"]
+            named = self.is_named(target["collection"])
+            metadatas = [{**m, "embedding_model": embedder.model} for m in metadatas]
+            # 离线导入时段落以独立行随页面一起传入，无需再切分
+            with_rows = {m.get("parent_id") for m in metadatas if m.get("kind") == "passage"}
+            embed_texts = []
+            for vid, metadata in zip(ids, metadatas):
+                if metadata.get("kind") == "passage":
+                    embed_texts.append(metadata.get("passage_text", ""))
+                    continue
+                passages = [dict(p) for p in metadata.get("passages") or []]
+                if named and not passages and str(vid) not in with_rows:
+                    passages = [{"index": i, "text": t} for i, t in enumerate(split_passages(metadata.get("origin_text", "")))]
+                metadata["passages"] = passages if named else []
+                embed_texts.append(metadata.get("summary_text", ""))
+                embed_texts.extend(p["text"] for p in metadata["passages"])
+
+            vectors = iter(embedder.embedding_batch(embed_texts))
+            page_vectors = []
+            for metadata in metadatas:
+                page_vectors.append(next(vectors))
+                for passage in metadata.get("passages", []):
+                    passage["vector"] = next(vectors)
+            if replace and named:
+                self.drop_passages(target["collection"], ids)
+            texts = {}
+            points = self.build_points(ids, page_vectors, metadatas, texts, named)
+            if texts:
+                self.text_store.put_many(texts)
+            self.client.upsert(collection_name=target["collection"], points=points)
+        except Exception as e:
+            print(f"[WARN] 双写新集合失败（将由重建追平）: {e}")
+
+    def store_vectors(self, vector: List[float], metadata: Dict[str, Any], vector_id: Optional[str] = None) -> str:
         """
         存储单条已生成的向量到 Qdrant
 
         Args:
             vector: 已经生成好的向量（来自 process_single_image）
             metadata: 元数据（image_path, origin_text, page 等）
+            vector_id: 指定 ID（重试时覆盖同一点，保证幂等），缺省随机生成
 
         Returns:
             vector_id: Qdrant 存储 ID
         """
 
         try:
-            # 生成向量 ID
-            vector_id = str(uuid.uuid4())
-
-            # 构造向量点
-            point = PointStruct(
-                id=vector_id,
-                vector=vector,  # ← 向量由上游多线程阶段生成
-                payload=metadata
-            )
+            # 段落 ID 按 (页面, 序号) 确定：指定 ID 的重写在段落变少时会残留多出的序号，先删掉旧段落；新 ID 不可能有段落
+            rewrite = vector_id is not None
+            vector_id = vector_id or str(uuid.uuid4())
+            named = self.active()["named"]
+            if named and rewrite:
+                self.drop_passages(self.collection_name, [vector_id])
+
+            # 构造页面点与段落点（向量由上游多线程阶段生成）
+            texts = {}
+            points = self.build_points([vector_id], [vector], [metadata], texts, named)
+            if texts:
+                self.text_store.put_many(texts)
 
             # 写入 Qdrant
-            result = self.client.upsert(
-                collection_name=self.collection_name,
-                points=[point]
-            )
-            print("插入成功",result)
+            with timed("upsert"):
+                self.client.upsert(
+                    collection_name=self.collection_name,
+                    points=points
+                )
+            self._dual_write([vector_id], [metadata], replace=rewrite)
             return vector_id
 
         except Exception as e:
@@ -89,34 +405,105 @@ class QDRANT_MANAGER:
             if len(vectors) != len(metadatas):
                 raise ValueError("vectors 与 metadatas 数量不一致")
 
-            points = []
-            ids = []
-            for vector, metadata in zip(vectors, metadatas):
-                vector_id = str(uuid.uuid4())
-                print(metadata)
-                print(len(vector))
-                ids.append(vector_id)
-                points.append(PointStruct(
-                    id=vector_id,
-                    vector=vector,
-                    payload=metadata
-                ))
-            print("待插入数据",len(points))
+            ids = [str(uuid.uuid4()) for _ in vectors]
+            texts = {}
+            points = self.build_points(ids, vectors, metadatas, texts, self.active()["named"])
+            if texts:
+                self.text_store.put_many(texts)
 
-            result = self.client.upsert(
-                collection_name=self.collection_name,
-                wait=True,
-                points=points
-            )
-            print("插入数据成功",result)
+            with timed("upsert"):
+                self.client.upsert(
+                    collection_name=self.collection_name,
+                    wait=True,
+                    points=points
+                )
+            self._dual_write(ids, metadatas)
             return ids
         except Exception as e:
             raise Exception(f"批量存储向量失败: {str(e)}")
 
+    def upload_bulk(self,
+                    ids: List[str],
+                    vectors: List[List[float]],
+                    metadatas: List[Dict[str, Any]],
+                    parallel: int = 4,
+                    batch_size: int = 256,
+                    collection: Optional[str] = None) -> int:
+        """
+        离线批量导入：upload_points 多进程并行上传（精简模式下文本写入侧存储）
+
+        Args:
+            ids: 点 ID（确定性 ID 保证重复导入幂等）
+            vectors: 向量列表
+            metadatas: 元数据列表
+            parallel: 并行上传进程数（本地模式 QDRANT_PATH 不支持多进程，固定为 1）
+            batch_size: 每批点数
+            collection: 写入指定物理集合（离线导入的暂存集合），缺省写入别名并参与重建双写
+
+        Returns:
+            int: 导入点数
+        """
+        try:
+            named = self.is_named(collection) if collection else self.active()["named"]
+            texts = {}
+            points = self.build_points(ids, vectors, metadatas, texts, named)
+            if texts:
+                self.text_store.put_many(texts)
+            with timed("upsert"):
+                self.client.upload_points(
+                    collection_name=collection or self.collection_name,
+                    points=points,
+                    batch_size=batch_size,
+                    parallel=1 if QDRANT_PATH else parallel,
+                    wait=True,
+                )
+            if collection is None:
+                self._dual_write(ids, metadatas)
+            return len(points)
+        except Exception as e:
+            raise Exception(f"批量导入向量失败: {str(e)}")
+
+    def disable_indexing(self, collection: Optional[str] = None) -> Optional[int]:
+        """导入前暂停 HNSW 建索引，返回原 indexing_threshold 以便恢复"""
+        try:
+            physical = collection or self.resolve_collection()
+            info = self.client.get_collection(physical)
+            previous = info.config.optimizer_config.indexing_threshold
+            self.client.update_collection(
+                collection_name=physical,
+                optimizers_config=OptimizersConfigDiff(indexing_threshold=0),
+            )
+            return previous
+        except Exception as e:
+            raise Exception(f"暂停索引失败: {str(e)}")
+
+    def enable_indexing(self,
+                        threshold: Optional[int] = 20000,
+                        wait_seconds: float = 3600,
+                        collection: Optional[str] = None) -> None:
+        """导入后恢复索引并等待集合重建完成（状态为 green）"""
+        try:
+            physical = collection or self.resolve_collection()
+            self.client.update_collection(
+                collection_name=physical,
+                optimizers_config=OptimizersConfigDiff(indexing_threshold=threshold or 20000),
+            )
+            deadline = time.monotonic() + wait_seconds
+            while time.monotonic() < deadline:
+                status = str(self.client.get_collection(physical).status).lower()
+                if status.endswith("green"):
+                    return
+                time.sleep(2)
+            print(f"[WARN] 等待 {physical} 索引重建超时")
+        except Exception as e:
+            raise Exception(f"恢复索引失败: {str(e)}")
+
     def search_vectors(self,
                        query_vector: List[float],
                        limit: int = 12,
-                       score_threshold: float = 0.1) -> List[ScoredPoint]:
+                       score_threshold: float = 0.1,
+                       collection: Optional[str] = None,
+                       using: Optional[str] = None) -> List[ScoredPoint]:
         """
         搜索相似向量
 
@@ -124,23 +511,127 @@ class QDRANT_MANAGER:
             query_vector: 查询向量
             limit: 返回结果数量
             score_threshold: 相似度阈值
+            collection: 指定物理集合（与生成查询向量的模型对应），缺省使用别名
+            using: 命名向量，命名向量集合缺省为 summary（页面摘要）
 
         Returns:
             List[score_threshold]: 搜索结果列表
         """
         try:
-            search_result = self.client.query_points(
-                collection_name=self.collection_name,
-                query=query_vector,
-                with_payload=True,
-                limit=limit,
-                score_threshold=score_threshold
-            ).points
+            named = self.is_named(collection) if collection else self.active()["named"]
+            with timed("search"):
+                search_result = self.client.query_points(
+                    collection_name=collection or self.collection_name,
+                    query=query_vector,
+                    using=(using or SUMMARY_VECTOR) if named else None,
+                    with_payload=SLIM_PAYLOAD_FIELDS if self.slim_payload else True,
+                    limit=limit,
+                    score_threshold=score_threshold,
+                    timeout=qdrant_timeout(),
+                ).points
 
             return search_result
+        except DeadlineExceeded:
+            raise
         except Exception as e:
             raise Exception(f"搜索向量失败: {str(e)}")
 
+    def search_pages(self,
+                     query_vector: List[float],
+                     limit: int = 12,
+                     score_threshold: float = 0.1,
+                     collection: Optional[str] = None) -> List[ScoredPoint]:
+        """
+        多粒度检索：页面摘要与 OCR 段落两个命名向量在一次批量查询中检索，段落按 parent_id 归并到所属页面
+        之后视命中情况最多再发两次请求：补取只命中段落的页面点（retrieve），为只命中摘要的页面补检段落（query_points）
+
+        Args:
+            query_vector: 查询向量
+            limit: 返回页面数
+            score_threshold: 相似度阈值
+            collection: 指定物理集合，缺省使用别名当前指向
+
+        Returns:
+            List[ScoredPoint]: 页面命中，score 取页面与其最佳段落的较高者，
+            payload["matched_passages"] 为该页匹配段落 [{"index", "text", "score"}]；旧集合退化为 search_vectors
+        """
+        physical = collection or self.active()["collection"]
+        if not self.is_named(physical):
+            return self.search_vectors(query_vector, limit, score_threshold, collection=physical)
+        with_payload = SLIM_PAYLOAD_FIELDS if self.slim_payload else True
+        try:
+            with timed("search"):
+                page_result, passage_result = self.client.query_batch_points(
+                    collection_name=physical,
+                    requests=[
+                        QueryRequest(query=query_vector, using=SUMMARY_VECTOR, limit=limit,
+                                     score_threshold=score_threshold, with_payload=with_payload),
+                        QueryRequest(query=query_vector, using=PASSAGE_VECTOR, limit=PASSAGE_SEARCH_LIMIT,
+                                     score_threshold=score_threshold, with_payload=with_payload),
+                    ],
+                    timeout=qdrant_timeout(),
+                )
+                pages = {str(p.id): p for p in page_result.points}
+                passages = defaultdict(list)
+                for p in passage_result.points:
+                    passages[p.payload["parent_id"]].append(p)
+
+                # 只命中段落的页面：补取页面点，分数取最佳段落
+                orphans = [pid for pid in passages if pid not in pages]
+                if orphans:
+                    for record in self.client.retrieve(physical, ids=orphans, with_payload=with_payload):
+                        pid = str(record.id)
+                        best = max(p.score for p in passages[pid])
+                        pages[pid] = models.ScoredPoint(id=record.id, version=0, score=best, payload=record.payload)
+
+                # 只命中摘要的页面：在这些页面内补一次段落检索
+                bare = [pid for pid in pages if pid not in passages]
+                if bare:
+                    for p in self.client.query_points(
+                        collection_name=physical,
+                        query=query_vector,
+                        using=PASSAGE_VECTOR,
+                        query_filter=passages_of(bare),
+                        limit=len(bare) * PASSAGES_PER_PAGE,
+                        with_payload=with_payload,
+                        timeout=qdrant_timeout(),
+                    ).points:
+                        passages[p.payload["parent_id"]].append(p)
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            raise Exception(f"搜索向量失败: {str(e)}")
+
+        hits, matched = [], {}
+        for pid, page in pages.items():
+            matched[pid] = sorted(passages.get(pid, []), key=lambda p: p.score, reverse=True)[:PASSAGES_PER_PAGE]
+            page.score = max([page.score] + [p.score for p in matched[pid]])
+            hits.append(page)
+        hits.sort(key=lambda p: p.score, reverse=True)
+        hits = hits[:limit]
+
+        # 只为最终入选页面保留的段落取文本（精简模式下段落文本在侧存储）
+        kept = [p for page in hits for p in matched[str(page.id)]]
+        if self.slim_payload and kept:
+            with timed("text_fetch"):
+                stored = self.text_store.get_many([str(p.id) for p in kept])
+                passage_texts = {pid: t.get("origin_text", "") for pid, t in stored.items()}
+                missing = [p for p in kept if str(p.id) not in passage_texts]
+                if missing:
+                    fallback = self._payload_texts(missing, ["passage_text"], collection=physical)
+                    passage_texts.update({pid: t["passage_text"] for pid, t in fallback.items()})
+        else:
+            passage_texts = {str(p.id): p.payload.get("passage_text", "") for p in kept}
+        for page in hits:
+            page.payload = {
+                **(page.payload or {}),
+                "matched_passages": [
+                    {"index": p.payload["passage_index"], "text": passage_texts.get(str(p.id), ""), "score": round(p.score, 4)}
+                    for p in sorted(matched[str(page.id)], key=lambda p: p.payload["passage_index"])
+                ],
+            }
+        return hits
+
     def delete_vectors(self, vector_ids: List[str]) -> bool:
         """
         删除指定的向量
@@ -152,12 +643,19 @@ class QDRANT_MANAGER:
             bool: 是否删除成功
         """
         try:
-            self.client.delete(
-                collection_name=self.collection_name,
-                points_selector=PointIdsList(
-                    points=vector_ids
+            collections = [self.collection_name]
+            target = _dual_write_targets.get(self.collection_name)
+            if target is not None:
+                collections.append(target["collection"])
+            for collection in collections:
+                self.client.delete(
+                    collection_name=collection,
+                    points_selector=PointIdsList(points=vector_ids)
                 )
-            )
+                # 同时删除这些页面的段落点
+                self.drop_passages(collection, vector_ids)
+            if self.slim_payload:
+                self.text_store.delete_many(vector_ids)
             return True
         except Exception as e:
             raise Exception(f"删除向量失败: {str(e)}")
@@ -179,9 +677,12 @@ class QDRANT_MANAGER:
             )
             if result and len(result) > 0:
                 point = result[0]
+                payload = dict(point.payload or {})
+                if self.slim_payload:
+                    payload.update(self.fetch_texts([point]).get(str(point.id), {}))
                 return {
                     'vector': point.vector,
-                    'payload': point.payload
+                    'payload': payload
                 }
             return None
         except Exception as e:
@@ -201,6 +702,13 @@ class QDRANT_MANAGER:
             bool: 是否更新成功
         """
         try:
+            if self.slim_payload and any(k in metadata for k in TEXT_FIELDS):
+                texts = self.text_store.get_many([vector_id]).get(vector_id)
+                if texts is None:
+                    texts = self._payload_texts([models.Record(id=vector_id)], list(TEXT_FIELDS)).get(vector_id, {})
+                texts.update({k: metadata[k] for k in TEXT_FIELDS if k in metadata})
+                self.text_store.put_many({vector_id: texts})
+                metadata = {k: v for k, v in metadata.items() if k not in TEXT_FIELDS}
             self.client.set_payload(
                 collection_name=self.collection_name,
                 payload=metadata,
@@ -218,8 +726,10 @@ class QDRANT_MANAGER:
             Dict: 统计信息
         """
         try:
-            collection_info = self.client.get_collection(self.collection_name)
+            physical = self.resolve_collection()
+            collection_info = self.client.get_collection(physical)
             return {
+                'collection': physical,
                 'vectors_count': collection_info.vectors_count,
                 'points_count': collection_info.points_count,
                 'segments_count': collection_info.segments_count,
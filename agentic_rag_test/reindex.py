@@ -0,0 +1,348 @@
+"""
+零停机重建索引 - 更换 embedding 模型/维度/HNSW 参数时，后台用已存摘要重新向量化到新集合，完成后原子切换别名
+不重新调用 VLM/OCR；重建期间本进程新写入双写到新集合，其他进程的写入由追平阶段按 ID 差异补齐
+新集合使用命名向量（summary + passage），段落由页面 OCR 文本重新切分生成，旧单向量集合借此升级为多粒度索引
+
+用法：
+    python -m agentic_rag_test.agentic_rag.reindex --embedding-model text-embedding-v4 --dim 2048
+    POST /admin/reindex?embedding_model=text-embedding-v4&dim=2048 ；GET /admin/reindex 查看进度
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from qdrant_client.models import FieldCondition, Filter, MatchValue, PointIdsList
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+from agentic_rag_test.agentic_rag.config import (
+    DATABASE_URL,
+    EMBEDDING_DIM,
+    EMBEDDING_MODEL,
+    QDRANT_HNSW_EF_CONSTRUCT,
+    QDRANT_HNSW_M,
+    REINDEX_BATCH_SIZE,
+    REINDEX_EMBED_BATCH,
+    REINDEX_EMBED_WORKERS,
+)
+from agentic_rag_test.agentic_rag.database.db import ensure_sync_url
+from agentic_rag_test.agentic_rag.llm_factory import LLMClient
+from agentic_rag_test.agentic_rag.passages import split_passages
+from agentic_rag_test.agentic_rag.qdrant_manager import (
+    ALIAS_REFRESH_SECONDS,
+    QDRANT_MANAGER,
+    physical_collection_name,
+    register_dual_write,
+    unregister_dual_write,
+)
+
+# 页面点（旧数据没有 kind 字段，同样视为页面）
+PAGES_ONLY = Filter(must_not=[FieldCondition(key="kind", match=MatchValue(value="passage"))])
+
+# advisory lock 键（"REIN"），所有进程共用
+REINDEX_LOCK_KEY = 0x5245494E
+
+
+class ReindexLock:
+    """
+    Postgres 会话级 advisory lock：多个 uvicorn worker / CLI / bulk_load 之间保证同一时间只有一个切换别名的任务
+    锁随专用连接持有到任务结束，进程崩溃时连接断开自动释放
+    """
+
+    def __init__(self, url: str = DATABASE_URL):
+        self.engine = create_engine(ensure_sync_url(url), poolclass=NullPool)
+        self.conn = None
+
+    def acquire(self) -> bool:
+        """尝试加锁，已被其他进程持有时返回 False"""
+        # 自动提交：长时间持锁时连接不停留在未结束的事务中
+        conn = self.engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        if conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": REINDEX_LOCK_KEY}).scalar():
+            self.conn = conn
+            return True
+        conn.close()
+        return False
+
+    def release(self) -> None:
+        if self.conn is None:
+            return
+        try:
+            self.conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": REINDEX_LOCK_KEY})
+        finally:
+            self.conn.close()
+            self.conn = None
+
+    def held(self) -> bool:
+        """是否有任意进程持有重建锁"""
+        with self.engine.connect() as conn:
+            return bool(conn.execute(
+                text(
+                    "SELECT EXISTS (SELECT 1 FROM pg_locks WHERE locktype = 'advisory' "
+                    "AND classid = 0 AND objid = :key AND objsubid = 1 AND granted)"
+                ),
+                {"key": REINDEX_LOCK_KEY},
+            ).scalar())
+
+
+class ReindexJob:
+    """后台重建任务：复制 → 追平 → 建索引 → 切换别名 → 再追平"""
+
+    def __init__(
+        self,
+        embedding_model: str = EMBEDDING_MODEL,
+        dim: int = EMBEDDING_DIM,
+        hnsw_m: int = QDRANT_HNSW_M,
+        ef_construct: int = QDRANT_HNSW_EF_CONSTRUCT,
+        batch_size: int = REINDEX_BATCH_SIZE,
+        embed_batch: int = REINDEX_EMBED_BATCH,
+        embed_workers: int = REINDEX_EMBED_WORKERS,
+        drop_old: bool = False,
+    ):
+        self.embedding_model = embedding_model
+        self.dim = dim
+        self.hnsw_m = hnsw_m
+        self.ef_construct = ef_construct
+        self.batch_size = batch_size
+        self.embed_batch = embed_batch
+        self.embed_workers = embed_workers
+        self.drop_old = drop_old
+        self.qdrant_manager = QDRANT_MANAGER()
+        self.client = self.qdrant_manager.client
+        self.embedder = LLMClient(provider="qwen-cn", model=embedding_model, dimensions=dim)
+        self.thread: Optional[threading.Thread] = None
+        self.lock = ReindexLock()
+        self.state: Dict[str, Any] = {
+            "status": "pending",
+            "phase": None,
+            "embedding_model": embedding_model,
+            "dim": dim,
+            "hnsw": {"m": hnsw_m, "ef_construct": ef_construct},
+            "source": None,
+            "target": None,
+            "total": 0,
+            "copied": 0,
+            "caught_up": 0,
+            "deleted": 0,
+            "points_per_sec": 0.0,
+            "eta_seconds": None,
+            "started_at": None,
+            "finished_at": None,
+            "error": None,
+        }
+        self._started = 0.0
+
+    # ---------- 复制 ----------
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        """按 embed_batch 切块并发请求 embedding"""
+        chunks = [texts[i:i + self.embed_batch] for i in range(0, len(texts), self.embed_batch)]
+        with ThreadPoolExecutor(max_workers=self.embed_workers) as pool:
+            results = list(pool.map(self.embedder.embedding_batch, chunks))
+        return [v for chunk in results for v in chunk]
+
+    def _copy_points(self, target: str, points) -> int:
+        """用新模型重新向量化页面并写入 target：重嵌入摘要，并由 OCR 文本重新切分段落"""
+        if not points:
+            return 0
+        texts = self.qdrant_manager.fetch_texts(points)
+        named = self.qdrant_manager.is_named(target)
+        metadatas = []
+        embed_texts = []
+        for p in points:
+            metadata = {**(p.payload or {}), "embedding_model": self.embedding_model}
+            metadata.update({k: v for k, v in texts.get(str(p.id), {}).items() if v})
+            passages = split_passages(metadata.get("origin_text", "")) if named else []
+            metadata["passages"] = [{"index": i, "text": t} for i, t in enumerate(passages)]
+            embed_texts.append(metadata.get("summary_text", ""))
+            embed_texts.extend(passages)
+            metadatas.append(metadata)
+
+        vectors = iter(self._embed(embed_texts))
+        page_vectors = []
+        for metadata in metadatas:
+            page_vectors.append(next(vectors))
+            for passage in metadata["passages"]:
+                passage["vector"] = next(vectors)
+        # 页面文本 ID 不变，重写无害；新切分出的段落文本需写入侧存储
+        built_texts = {}
+        built = self.qdrant_manager.build_points([p.id for p in points], page_vectors, metadatas, built_texts, named)
+        if named:  # 重嵌入的页面可能已有段落，切分结果变化时不留旧序号
+            self.qdrant_manager.drop_passages(target, [p.id for p in points])
+        if built_texts:
+            self.qdrant_manager.text_store.put_many(built_texts)
+        self.client.upsert(collection_name=target, points=built)
+        return len(points)
+
+    def _progress(self) -> None:
+        elapsed = time.perf_counter() - self._started
+        done = self.state["copied"]
+        rate = done / elapsed if elapsed else 0.0
+        self.state["points_per_sec"] = round(rate, 1)
+        remaining = max(self.state["total"] - done, 0)
+        self.state["eta_seconds"] = round(remaining / rate) if rate else None
+
+    def _full_copy(self, source: str, target: str) -> None:
+        """只复制页面点，段落由页面重新生成"""
+        self.state["phase"] = "copy"
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=source,
+                limit=self.batch_size,
+                offset=offset,
+                scroll_filter=PAGES_ONLY,
+                with_payload=True,
+                with_vectors=False,
+            )
+            self.state["copied"] += self._copy_points(target, points)
+            self._progress()
+            if offset is None:
+                break
+
+    # ---------- 追平 ----------
+
+    def _scroll_ids(self, collection: str, scroll_filter=None):
+        offset = None
+        while True:
+            points, offset = self.client.scroll(
+                collection_name=collection,
+                limit=self.batch_size,
+                offset=offset,
+                scroll_filter=scroll_filter,
+                with_payload=False,
+                with_vectors=False,
+            )
+            yield [p.id for p in points]
+            if offset is None:
+                break
+
+    def _catch_up(self, source: str, target: str, delete_removed: bool) -> None:
+        """补齐 source 中有而 target 缺失的页面；重嵌入 target 中旧模型写入的页面（连同段落）；可选删除 source 已删除的页面及其段落"""
+        self.state["phase"] = "catch_up"
+        for ids in self._scroll_ids(source, PAGES_ONLY):
+            present = {p.id for p in self.client.retrieve(target, ids=ids, with_payload=False)}
+            missing = [i for i in ids if i not in present]
+            if missing:
+                points = self.client.retrieve(source, ids=missing, with_payload=True)
+                self.state["caught_up"] += self._copy_points(target, points)
+        self._reembed_stale(target)
+        if delete_removed:
+            for ids in self._scroll_ids(target, PAGES_ONLY):
+                present = {p.id for p in self.client.retrieve(source, ids=ids, with_payload=False)}
+                removed = [i for i in ids if i not in present]
+                if removed:
+                    self.client.delete(target, points_selector=PointIdsList(points=removed))
+                    self.qdrant_manager.drop_passages(target, removed)
+                    self.state["deleted"] += len(removed)
+
+    def _reembed_stale(self, target: str) -> None:
+        """重嵌入 target 中用旧模型写入的页面（别名缓存未刷新的进程会这样写入）"""
+        stale = Filter(must_not=[
+            FieldCondition(key="embedding_model", match=MatchValue(value=self.embedding_model)),
+            FieldCondition(key="kind", match=MatchValue(value="passage")),
+        ])
+        for ids in self._scroll_ids(target, stale):
+            if ids:
+                points = self.client.retrieve(target, ids=ids, with_payload=True)
+                self.state["caught_up"] += self._copy_points(target, points)
+
+    # ---------- 主流程 ----------
+
+    def run(self) -> Dict[str, Any]:
+        alias = self.qdrant_manager.collection_name
+        self.state["status"] = "running"
+        self.state["started_at"] = datetime.now().isoformat(timespec="seconds")
+        self._started = time.perf_counter()
+        try:
+            source = self.qdrant_manager.resolve_collection()
+            legacy = source == alias  # 旧部署：别名同名的物理集合
+            target = physical_collection_name(alias, self.embedding_model, self.dim)
+            self.state.update(source=source, target=target)
+            self.state["total"] = self.client.count(source, count_filter=PAGES_ONLY, exact=True).count
+
+            self.qdrant_manager.create_physical_collection(target, self.dim, self.hnsw_m, self.ef_construct)
+            indexing_threshold = self.qdrant_manager.disable_indexing(collection=target)
+            register_dual_write(alias, target, self.embedder)
+            try:
+                self._full_copy(source, target)
+                self._catch_up(source, target, delete_removed=True)
+                self.state["phase"] = "indexing"
+                self.qdrant_manager.enable_indexing(indexing_threshold, collection=target)
+                self.state["phase"] = "swap"
+                if legacy:
+                    # 同名物理集合无法先建别名，只能删除后再建；删除前再追平一次，
+                    # 把建索引期间其他进程写入旧集合的数据补到新集合，丢失窗口缩到「追平 → 删除」之间
+                    print(f"[WARN] {alias} 为旧式物理集合，切换时将删除后建立别名")
+                    self._catch_up(source, target, delete_removed=True)
+                    self.state["phase"] = "swap"
+                    self.client.delete_collection(source)
+                self.qdrant_manager.swap_alias(target)
+            finally:
+                unregister_dual_write(alias)
+
+            # 等各进程刷新别名缓存后，再补齐切换窗口内写入旧集合/用旧模型写入的数据
+            time.sleep(ALIAS_REFRESH_SECONDS * 2)
+            self.state["phase"] = "catch_up"
+            if legacy:
+                self._reembed_stale(target)
+            else:
+                self._catch_up(source, target, delete_removed=False)
+                if self.drop_old:
+                    self.client.delete_collection(source)
+            self.state["status"] = "finished"
+            self.state["phase"] = "done"
+        except Exception as e:
+            self.state["status"] = "failed"
+            self.state["error"] = str(e)
+            print(f"[WARN] 重建失败: {e}")
+        finally:
+            self._progress()
+            self.state["finished_at"] = datetime.now().isoformat(timespec="seconds")
+            self.lock.release()
+        return self.state
+
+    def start(self) -> None:
+        """在后台线程运行（调用方须先通过 self.lock.acquire() 取得重建锁，run 结束时释放）"""
+        self.thread = threading.Thread(target=self.run, name="reindex", daemon=True)
+        self.thread.start()
+
+    @property
+    def running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agentic RAG 零停机重建索引")
+    parser.add_argument("--embedding-model", default=EMBEDDING_MODEL)
+    parser.add_argument("--dim", type=int, default=EMBEDDING_DIM)
+    parser.add_argument("--hnsw-m", type=int, default=QDRANT_HNSW_M)
+    parser.add_argument("--ef-construct", type=int, default=QDRANT_HNSW_EF_CONSTRUCT)
+    parser.add_argument("--batch-size", type=int, default=REINDEX_BATCH_SIZE)
+    parser.add_argument("--embed-workers", type=int, default=REINDEX_EMBED_WORKERS)
+    parser.add_argument("--drop-old", action="store_true", help="切换完成后删除旧集合")
+    args = parser.parse_args()
+    job = ReindexJob(
+        embedding_model=args.embedding_model,
+        dim=args.dim,
+        hnsw_m=args.hnsw_m,
+        ef_construct=args.ef_construct,
+        batch_size=args.batch_size,
+        embed_workers=args.embed_workers,
+        drop_old=args.drop_old,
+    )
+    if not job.lock.acquire():
+        print("[WARN] 已有重建任务在运行")
+        return
+    job.start()
+    while job.running:
+        s = job.state
+        print(f"[INFO] {s['phase']}: {s['copied']}/{s['total']}，{s['points_per_sec']} 点/秒，ETA {s['eta_seconds']}s")
+        job.thread.join(timeout=10)
+    print(job.state)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""准入控制：优先级唤醒、队列满 429、排队超时 503、请求时限"""
+import asyncio
+
+import pytest
+
+from agentic_rag_test.agentic_rag.admission import (
+    AdmissionController,
+    DeadlineExceeded,
+    EndpointPolicy,
+    Overloaded,
+    expired,
+    remaining,
+)
+
+
+def controller(total_slots: int = 1, **overrides) -> AdmissionController:
+    policies = {
+        "base": EndpointPolicy(limit=1, queue=4, max_wait=5, priority=0, deadline=None),
+        "agentic": EndpointPolicy(limit=1, queue=4, max_wait=5, priority=2, deadline=None),
+    }
+    for name, policy in overrides.items():
+        policies[name] = policy
+    return AdmissionController(total_slots, policies)
+
+
+def test_freed_slot_goes_to_higher_priority_waiter():
+    async def scenario():
+        ctl = controller()
+        await ctl.acquire("agentic")
+        order = []
+
+        async def wait(name: str):
+            await ctl.acquire(name)
+            order.append(name)
+
+        # agentic 先到，但空出的槽位应分给优先级更高的 base
+        agentic = asyncio.create_task(wait("agentic"))
+        await asyncio.sleep(0)
+        base = asyncio.create_task(wait("base"))
+        await asyncio.sleep(0)
+        assert ctl.snapshot()["agentic"]["queued"] == 1
+        assert ctl.snapshot()["base"]["queued"] == 1
+
+        ctl.release("agentic", 0.0)
+        await base
+        assert order == ["base"]
+        assert not agentic.done()
+
+        ctl.release("base", 0.0)
+        await agentic
+        assert order == ["base", "agentic"]
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_rejects_with_429():
+    async def scenario():
+        ctl = controller(base=EndpointPolicy(limit=1, queue=1, max_wait=5, priority=0, deadline=None))
+        await ctl.acquire("base")
+        waiter = asyncio.create_task(ctl.acquire("base"))
+        await asyncio.sleep(0)
+        with pytest.raises(Overloaded) as exc:
+            await ctl.acquire("base")
+        assert exc.value.status_code == 429
+        assert exc.value.retry_after >= 1
+        ctl.release("base", 0.0)
+        await waiter
+
+    asyncio.run(scenario())
+
+
+def test_queue_timeout_rejects_with_503_and_leaves_queue():
+    async def scenario():
+        ctl = controller(base=EndpointPolicy(limit=1, queue=4, max_wait=0.05, priority=0, deadline=None))
+        await ctl.acquire("base")
+        with pytest.raises(Overloaded) as exc:
+            await ctl.acquire("base")
+        assert exc.value.status_code == 503
+        assert ctl.snapshot()["base"] == {"active": 1, "queued": 0}
+
+    asyncio.run(scenario())
+
+
+def test_admit_sets_and_resets_deadline():
+    async def scenario():
+        ctl = controller(base=EndpointPolicy(limit=1, queue=4, max_wait=5, priority=0, deadline=0.05))
+        async with ctl.admit("base"):
+            assert 0 < remaining() <= 0.05
+            await asyncio.sleep(0.06)
+            assert expired()
+            with pytest.raises(DeadlineExceeded):
+                remaining()
+        assert remaining() is None
+        assert ctl.snapshot()["base"]["active"] == 0
+
+    asyncio.run(scenario())
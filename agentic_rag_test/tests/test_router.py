@@ -0,0 +1,76 @@
+"""/rag/auto 路由启发式"""
+from types import SimpleNamespace
+
+import pytest
+
+from agentic_rag_test.agentic_rag.tools import router
+from agentic_rag_test.agentic_rag.tools.router import query_complexity, route_query
+
+
+@pytest.fixture(autouse=True)
+def thresholds(monkeypatch):
+    """固定阈值，不受本地 .env 影响"""
+    monkeypatch.setattr(router, "ROUTER_MIN_TOP_SCORE", 0.35)
+    monkeypatch.setattr(router, "ROUTER_CONFIDENT_SCORE", 0.6)
+    monkeypatch.setattr(router, "ROUTER_MAX_DOCS_FOR_BASE", 2)
+    monkeypatch.setattr(router, "ROUTER_FLAT_SPREAD", 0.05)
+    monkeypatch.setattr(router, "ROUTER_COMPLEXITY_THRESHOLD", 2)
+
+
+def hit(score: float, filename: str):
+    return SimpleNamespace(score=score, payload={"filename": filename})
+
+
+@pytest.mark.parametrize("message", [
+    "宁德时代的毛利率是多少？",
+    "公司和客户的关系是什么？",  # 单个「和」不是并列列表
+    "报告中提到的2023年营收是多少？",  # 「报告」不计为复杂特征词
+    "2023年营收增长, 利润下降的原因",  # 两个分句不构成三项并列
+])
+def test_ordinary_questions_are_simple(message):
+    assert query_complexity(message)["score"] < 2
+
+
+def test_enumeration_counts_items_of_longest_list():
+    c = query_complexity("宁德时代、比亚迪和LG新能源的市场份额对比")
+    assert c["enumerations"] == 3
+    assert c["keywords"] == ["对比"]
+    assert c["score"] == 2
+
+
+def test_multi_part_question_scores_every_signal():
+    c = query_complexity("对比宁德时代、比亚迪、中创新航的毛利率，并分析差异的原因？未来趋势如何？")
+    assert c["enumerations"] == 3
+    assert c["questions"] == 2
+    assert c["score"] >= 4
+
+
+def test_no_hits_routes_to_base():
+    decision = route_query("对比宁德时代、比亚迪和LG的趋势", [])
+    assert decision["route"] == "base"
+
+
+def test_low_relevance_routes_to_base_even_for_complex_question():
+    hits = [hit(0.2, "a.pdf"), hit(0.18, "b.pdf"), hit(0.15, "c.pdf")]
+    assert route_query("对比宁德时代、比亚迪和LG的趋势", hits)["route"] == "base"
+
+
+def test_concentrated_confident_hits_route_to_base():
+    hits = [hit(0.82, "a.pdf"), hit(0.7, "a.pdf"), hit(0.55, "b.pdf")]
+    decision = route_query("宁德时代的毛利率是多少？", hits)
+    assert decision["route"] == "base"
+    assert decision["signals"]["distinct_docs"] == 2
+
+
+def test_flat_hits_across_many_docs_route_to_agentic():
+    hits = [hit(0.5, "a.pdf"), hit(0.49, "b.pdf"), hit(0.48, "c.pdf"), hit(0.47, "d.pdf")]
+    decision = route_query("宁德时代的毛利率是多少？", hits)
+    assert decision["route"] == "agentic"
+    assert "命中分散在多个文档且分数分布平坦" in decision["reasons"]
+
+
+def test_complex_question_routes_to_agentic_despite_confident_hits():
+    hits = [hit(0.85, "a.pdf"), hit(0.8, "a.pdf")]
+    decision = route_query("宁德时代、比亚迪和LG新能源的市场份额对比", hits)
+    assert decision["route"] == "agentic"
+    assert decision["reasons"] == ["问题需要拆解或多角度综合"]
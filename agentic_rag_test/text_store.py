@@ -0,0 +1,158 @@
+"""
+文本侧存储 - 精简 Payload 模式下保存 origin_text / summary_text
+Qdrant 中只保留 id 与小字段，大文本 zlib 压缩后按向量 ID 存入本地 SQLite 或 PostgreSQL，
+检索后只对最终入选的命中批量取回。段落点的文本以段落 ID 为键存入 origin_text。
+"""
+import sqlite3
+import threading
+import zlib
+from typing import Dict, List, Optional
+
+from agentic_rag_test.agentic_rag.config import (
+    DATABASE_URL,
+    TEXT_STORE_BACKEND,
+    TEXT_STORE_PATH,
+)
+
+# 从 payload 中剥离、写入侧存储的字段
+TEXT_FIELDS = ("origin_text", "summary_text")
+
+
+def _pack(text: str) -> bytes:
+    return zlib.compress((text or "").encode("utf-8"), 6)
+
+
+def _unpack(blob: bytes) -> str:
+    return zlib.decompress(blob).decode("utf-8")
+
+
+class LocalTextStore:
+    """本地 SQLite 键值存储（单文件，线程安全）"""
+
+    def __init__(self, path: str = TEXT_STORE_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS page_texts ("
+            "id TEXT PRIMARY KEY, origin_text BLOB, summary_text BLOB)"
+        )
+        self._conn.commit()
+
+    def put_many(self, items: Dict[str, Dict[str, str]]) -> None:
+        rows = [
+            (vid, _pack(t.get("origin_text", "")), _pack(t.get("summary_text", "")))
+            for vid, t in items.items()
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO page_texts VALUES (?, ?, ?)", rows
+            )
+            self._conn.commit()
+
+    def get_many(self, ids: List[str]) -> Dict[str, Dict[str, str]]:
+        if not ids:
+            return {}
+        marks = ",".join("?" * len(ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, origin_text, summary_text FROM page_texts WHERE id IN ({marks})",
+                list(ids),
+            ).fetchall()
+        return {
+            vid: {"origin_text": _unpack(o), "summary_text": _unpack(s)}
+            for vid, o, s in rows
+        }
+
+    def delete_many(self, ids: List[str]) -> None:
+        if not ids:
+            return
+        marks = ",".join("?" * len(ids))
+        with self._lock:
+            self._conn.execute(f"DELETE FROM page_texts WHERE id IN ({marks})", list(ids))
+            self._conn.commit()
+
+
+class PostgresTextStore:
+    """PostgreSQL 侧存储（复用 DATABASE_URL，同步连接供线程池调用）"""
+
+    def __init__(self, url: str = DATABASE_URL):
+        from sqlalchemy import (
+            Column, LargeBinary, MetaData, String, Table, create_engine,
+        )
+        from agentic_rag_test.agentic_rag.database.db import ensure_sync_url
+
+        self._engine = create_engine(ensure_sync_url(url), pool_pre_ping=True)
+        metadata = MetaData()
+        self._table = Table(
+            "page_texts",
+            metadata,
+            Column("id", String(64), primary_key=True),
+            Column("origin_text", LargeBinary, nullable=False),
+            Column("summary_text", LargeBinary, nullable=False),
+        )
+        metadata.create_all(self._engine, tables=[self._table])
+
+    def put_many(self, items: Dict[str, Dict[str, str]]) -> None:
+        from sqlalchemy.dialects.postgresql import insert
+
+        if not items:
+            return
+        rows = [
+            {
+                "id": vid,
+                "origin_text": _pack(t.get("origin_text", "")),
+                "summary_text": _pack(t.get("summary_text", "")),
+            }
+            for vid, t in items.items()
+        ]
+        stmt = insert(self._table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["id"],
+            set_={
+                "origin_text": stmt.excluded.origin_text,
+                "summary_text": stmt.excluded.summary_text,
+            },
+        )
+        with self._engine.begin() as conn:
+            conn.execute(stmt)
+
+    def get_many(self, ids: List[str]) -> Dict[str, Dict[str, str]]:
+        from sqlalchemy import select
+
+        if not ids:
+            return {}
+        stmt = select(self._table).where(self._table.c.id.in_(list(ids)))
+        with self._engine.connect() as conn:
+            rows = conn.execute(stmt).all()
+        return {
+            row.id: {
+                "origin_text": _unpack(row.origin_text),
+                "summary_text": _unpack(row.summary_text),
+            }
+            for row in rows
+        }
+
+    def delete_many(self, ids: List[str]) -> None:
+        if not ids:
+            return
+        with self._engine.begin() as conn:
+            conn.execute(self._table.delete().where(self._table.c.id.in_(list(ids))))
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_text_store(backend: Optional[str] = None):
+    """获取进程内共享的文本侧存储实例"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            backend = backend or TEXT_STORE_BACKEND
+            if backend == "postgres":
+                _store = PostgresTextStore()
+            elif backend == "local":
+                _store = LocalTextStore()
+            else:
+                raise ValueError(f"未知文本存储后端: {backend}")
+        return _store
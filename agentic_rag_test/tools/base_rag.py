@@ -3,9 +3,41 @@ RAG 检索与生成 - Base RAG 与 Agent 工具 search_base_rag
 """
 from qdrant_manager import QDRANT_MANAGER
 from llm_factory import LLMClient
+from agentic_rag_test.agentic_rag.admission import expired
+from agentic_rag_test.agentic_rag.prompt.base_rag_prompt import build_base_rag_messages
 
 qdrant_manager = QDRANT_MANAGER()
-qwen_embedding = LLMClient(provider="qwen-cn", model="text-embedding-v4")
+deepseek_chat = LLMClient(provider="deepseek", model="deepseek-chat")
+
+
+def retrieve(message: str) -> list:
+    """向量检索，返回命中点（供 Base RAG、Agent 工具与 /rag/auto 路由复用）"""
+    # 查询向量与检索集合取自同一快照，别名切换瞬间也不会出现模型/维度不一致
+    active = qdrant_manager.active()
+    message_vector = active["embedder"].embedding(message)
+    # 页面摘要与 OCR 段落一起检索，段落归并到所属页面（旧集合只有摘要向量）
+    return qdrant_manager.search_pages(message_vector, collection=active["collection"])
+
+
+def page_text(payload: dict, texts: dict) -> str:
+    """命中页面的正文：有匹配段落时为「页面摘要 + 匹配段落」，否则为整页 OCR 文本"""
+    passages = payload.get("matched_passages")
+    if not passages:
+        return texts.get("origin_text", "")
+    lines = [f"页面摘要：{texts.get('summary_text', '')}", "匹配段落："]
+    lines += [f"……{p['text']}……" for p in passages]
+    return "\n".join(lines)
+
+
+def format_hits(result: list) -> str:
+    """为命中批量取回文本并拼接为「来源文件 + 切片内容」"""
+    texts = qdrant_manager.fetch_texts(result)
+    search_data = ""
+    for scp in result:
+        image_path = scp.payload.get("image_path", "")
+        content = page_text(scp.payload, texts.get(str(scp.id), {}))
+        search_data += f"来源文件：{image_path}\n切片内容：\n{content}\n\n"
+    return search_data
 
 
 def search_base_rag(message: str) -> str:
@@ -16,24 +48,22 @@ def search_base_rag(message: str) -> str:
     不适用：日常常识、纯主观判断、无需资料支撑的简短问题。
     输入：message (str) 用户问题；输出：拼接的「来源文件 + 切片内容」文本。
     """
-    message_vector = qwen_embedding.embedding(message)
-    result = qdrant_manager.search_vectors(message_vector)
-    search_data = ""
-    for scp in result:
-        image_path = scp.payload.get("image_path", "")
-        origin_text = scp.payload.get("origin_text", "")
-        search_data += f"来源文件：\n{origin_text}\n切片内容：\n{image_path}\n\n"
-    return search_data
+    try:
+        return format_hits(retrieve(message))
+    except Exception:
+        if expired():
+            return "【请求时限已到，无法继续检索，请基于已获取的资料立即完成回答】"
+        raise
 
 
-def ask_base_rag(message: str) -> str:
-    """Base RAG 问答：检索 + 大模型生成"""
-    search_data = search_base_rag(message)
-    rag_prompt = f"""
-根据以下内容，结合用户的问题，给出详细且专业的回答，回答时请引用来源文件中的内容：
-用户问题：{message}
-检索内容：{search_data}
-请基于以上内容回答，仅输出答案，精简专业。
-"""
-    deepseek_chat = LLMClient(provider="deepseek", model="deepseek-chat")
-    return deepseek_chat.chat(rag_prompt)
+def prompt_order(hits: list) -> list:
+    """按 (文件, 页码) 排序：检索到同一批页面时拼出的提示词完全一致，利于前缀缓存"""
+    return sorted(hits, key=lambda p: (p.payload.get("filename", ""), p.payload.get("image_index") or 0, str(p.id)))
+
+
+def ask_base_rag(message: str, hits: list = None) -> str:
+    """Base RAG 问答：检索 + 大模型生成；传入 hits 时复用已有检索结果"""
+    if hits is None:
+        hits = retrieve(message)
+    search_data = format_hits(prompt_order(hits))
+    return deepseek_chat.chat_messages(build_base_rag_messages(message, search_data))
@@ -0,0 +1,123 @@
+"""
+Agent 单次运行内的检索备忘 - 已返回过的页面再次命中时只给引用编号，不重复塞入全文
+配套 expand_chunk 工具按编号取回全文；统计 Agent 上下文因此少放入的 token 数
+"""
+import re
+import threading
+from typing import Any, Dict, List
+
+from agentic_rag_test.agentic_rag.admission import expired
+from agentic_rag_test.agentic_rag.metrics import CONTEXT_TOKENS_SAVED, record_cache
+from agentic_rag_test.agentic_rag.tools.base_rag import page_text, prompt_order, qdrant_manager, retrieve
+
+_CJK = re.compile(r"[一-鿿　-〿＀-￯]")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算 token：中文约 0.6 token/字，其余约 0.3 token/字符（DeepSeek 官方换算）"""
+    cjk = len(_CJK.findall(text))
+    return int(cjk * 0.6 + (len(text) - cjk) * 0.3)
+
+
+def _render(ref: str, image_path: str, origin_text: str) -> str:
+    return f"[{ref}] 来源文件：{image_path}\n切片内容：\n{origin_text}\n\n"
+
+
+class RetrievalMemo:
+    """一次 Agent 运行内共享：页面 ID → 引用编号（R1、R2…）与全文"""
+
+    def __init__(self):
+        self.refs: Dict[str, str] = {}  # 向量ID → 引用编号
+        self.chunks: Dict[str, Dict[str, Any]] = {}  # 引用编号 → {"image_path", "origin_text", "summary_text", "shown"}
+        self.stats = {"searches": 0, "hits": 0, "repeat_hits": 0, "expands": 0, "tokens_saved": 0}
+        self.lock = threading.Lock()  # Agent 可能并发调用检索工具
+
+    def format_hits(self, hits: list) -> str:
+        """新页面给出编号 + 正文；已出现过的页面只给编号与来源，以及此前未给出的新匹配段落"""
+        with self.lock:
+            new_hits = [p for p in hits if str(p.id) not in self.refs]
+        texts = qdrant_manager.fetch_texts(new_hits) if new_hits else {}
+        parts: List[str] = []
+        with self.lock:
+            self.stats["searches"] += 1
+            for p in prompt_order(hits):
+                vid = str(p.id)
+                payload = p.payload or {}
+                image_path = payload.get("image_path", "")
+                passages = payload.get("matched_passages") or []
+                self.stats["hits"] += 1
+                ref = self.refs.get(vid)
+                if ref is None:
+                    ref = f"R{len(self.refs) + 1}"
+                    self.refs[vid] = ref
+                    page_texts = texts.get(vid, {})
+                    self.chunks[ref] = {
+                        "image_path": image_path,
+                        "origin_text": page_texts.get("origin_text", ""),
+                        "summary_text": page_texts.get("summary_text", ""),
+                        "shown": {q["index"] for q in passages},
+                    }
+                    parts.append(_render(ref, image_path, page_text(payload, page_texts)))
+                    record_cache("retrieval_memo", False)
+                    continue
+                chunk = self.chunks[ref]
+                full = _render(ref, image_path, page_text(payload, chunk))
+                fresh = [q for q in passages if q["index"] not in chunk["shown"]]
+                stub = f"[{ref}] 已在前文给出（{image_path}），如需全文请调用 expand_chunk(\"{ref}\")\n"
+                if fresh:
+                    chunk["shown"].update(q["index"] for q in fresh)
+                    stub += "同页新匹配段落：\n" + "\n".join(f"……{q['text']}……" for q in fresh) + "\n"
+                stub += "\n"
+                saved = max(estimate_tokens(full) - estimate_tokens(stub), 0)
+                self.stats["repeat_hits"] += 1
+                self.stats["tokens_saved"] += saved
+                CONTEXT_TOKENS_SAVED.inc(saved)
+                record_cache("retrieval_memo", True)
+                parts.append(stub)
+        return "".join(parts)
+
+    def expand(self, ref: str) -> str:
+        ref = ref.strip().strip("[]").upper()
+        with self.lock:
+            chunk = self.chunks.get(ref)
+            self.stats["expands"] += 1
+            if chunk is not None:
+                # 展开会重新放入全文，从节省量中扣除
+                self.stats["tokens_saved"] -= estimate_tokens(chunk["origin_text"])
+        if chunk is None:
+            return f"未找到引用 {ref}，可用编号：{', '.join(self.chunks) or '无'}"
+        return _render(ref, chunk["image_path"], chunk["origin_text"])
+
+    def report(self) -> Dict[str, Any]:
+        with self.lock:
+            return {**self.stats, "unique_pages": len(self.refs)}
+
+
+def make_agent_tools(memo: RetrievalMemo) -> list:
+    """为一次 Agent 运行生成绑定同一 memo 的检索工具与展开工具"""
+
+    def search_base_rag(message: str) -> str:
+        """
+        【商业深度报告专业检索与分析工具】
+        从商业研究报告知识库中检索与用户问题相关的内容，返回拼接的检索结果文本。
+        适用场景：公司研究、行业分析、市场趋势、商业模式、研究结论等需基于资料回答的问题。
+        不适用：日常常识、纯主观判断、无需资料支撑的简短问题。
+        输入：message (str) 用户问题；输出：带引用编号 [R1]、[R2]… 的「来源文件 + 切片内容」文本，
+        本次任务中已返回过的页面只给出编号，不再重复全文。
+        """
+        try:
+            return memo.format_hits(retrieve(message))
+        except Exception:
+            # 时限耗尽后的任何失败（DeadlineExceeded、客户端超时）都提示 Agent 收尾，而不是让工具报错
+            if expired():
+                return "【请求时限已到，无法继续检索，请基于已获取的资料立即完成回答】"
+            raise
+
+    def expand_chunk(ref: str) -> str:
+        """
+        按引用编号（如 R3）取回此前检索结果中该页面的全文。
+        仅在需要重新核对某页原文、而前文已无法直接引用时调用。
+        """
+        return memo.expand(ref)
+
+    return [search_base_rag, expand_chunk]
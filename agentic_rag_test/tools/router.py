@@ -0,0 +1,89 @@
+"""
+/rag/auto 路由 - 基于一次检索结果与问题文本的本地信号，选择 Base RAG 或 Agentic RAG
+不调用大模型：分数分布、命中文档数、问题拆解启发式
+"""
+import os
+import re
+from typing import Any, Dict, List
+
+from agentic_rag_test.agentic_rag.config import (
+    ROUTER_COMPLEXITY_THRESHOLD,
+    ROUTER_CONFIDENT_SCORE,
+    ROUTER_FLAT_SPREAD,
+    ROUTER_MAX_DOCS_FOR_BASE,
+    ROUTER_MIN_TOP_SCORE,
+)
+
+# 需要多角度检索/综合的问题特征词（不含「报告」：面向研究报告库的问题几乎都会出现该词）
+COMPLEX_KEYWORDS = (
+    "对比", "比较", "差异", "分别", "趋势", "汇总", "综述", "全面", "深度",
+    "为什么", "原因", "影响", "如何看待", "前景", "格局", "演变", "历年", "各家",
+)
+# 并列项：至少三个短名词短语由 、/和/与/及/英文逗号 连接（如「宁德时代、比亚迪和LG」）；单个连词、分句逗号不计
+_ENUM_ITEM = r"[^、,，;；和与及。？?！!\s]{1,12}"
+_ENUM_SEP = r"(?:、|,\s*|和|与|及)"
+ENUM_PATTERN = re.compile(rf"{_ENUM_ITEM}(?:{_ENUM_SEP}{_ENUM_ITEM}){{2,}}")
+
+
+def _doc_key(payload: Dict[str, Any]) -> str:
+    """命中所属文档：优先 filename，旧数据回退到图片所在目录"""
+    if payload.get("filename"):
+        return payload["filename"]
+    return os.path.dirname(payload.get("image_path", "")) or "unknown"
+
+
+def query_complexity(message: str) -> Dict[str, Any]:
+    """问题拆解启发式：特征词、并列项、多问句、长度"""
+    keywords = [k for k in COMPLEX_KEYWORDS if k in message]
+    # 最长并列列表的项数
+    enumerations = max((len(re.findall(_ENUM_SEP, run)) + 1 for run in ENUM_PATTERN.findall(message)), default=0)
+    questions = len(re.findall(r"[？?]", message))
+    score = len(keywords) + (enumerations >= 3) + (questions >= 2) + (len(message) > 60)
+    return {
+        "keywords": keywords,
+        "enumerations": enumerations,
+        "questions": questions,
+        "length": len(message),
+        "score": score,
+    }
+
+
+def route_query(message: str, hits: List[Any]) -> Dict[str, Any]:
+    """
+    根据检索命中与问题文本决定路由
+
+    Args:
+        message: 用户问题
+        hits: retrieve() 返回的命中点
+
+    Returns:
+        Dict: {"route": "base" | "agentic", "reasons": [...], "signals": {...}}
+    """
+    scores = [h.score for h in hits]
+    top = max(scores) if scores else 0.0
+    mean = sum(scores) / len(scores) if scores else 0.0
+    docs = {_doc_key(h.payload or {}) for h in hits}
+    complexity = query_complexity(message)
+    signals = {
+        "hits": len(hits),
+        "top_score": round(top, 4),
+        "mean_score": round(mean, 4),
+        "spread": round(top - mean, 4),
+        "distinct_docs": len(docs),
+        "complexity": complexity,
+    }
+
+    reasons = []
+    if complexity["score"] >= ROUTER_COMPLEXITY_THRESHOLD:
+        reasons.append("问题需要拆解或多角度综合")
+    if len(docs) > ROUTER_MAX_DOCS_FOR_BASE and signals["spread"] < ROUTER_FLAT_SPREAD:
+        reasons.append("命中分散在多个文档且分数分布平坦")
+    if hits and ROUTER_MIN_TOP_SCORE <= top < ROUTER_CONFIDENT_SCORE and len(docs) > ROUTER_MAX_DOCS_FOR_BASE:
+        reasons.append("最高分不够集中，单次检索证据可能不足")
+
+    if not hits or top < ROUTER_MIN_TOP_SCORE:
+        # 知识库缺少相关资料时 Agent 多轮检索也难有收获，直接走低成本路径
+        return {"route": "base", "reasons": ["检索相关度过低，知识库资料不足"], "signals": signals}
+    if reasons:
+        return {"route": "agentic", "reasons": reasons, "signals": signals}
+    return {"route": "base", "reasons": ["单次检索证据集中，可直接回答"], "signals": signals}